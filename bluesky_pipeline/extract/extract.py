@@ -21,63 +21,125 @@ URI = "wss://jetstream2.us-east.bsky.network/subscribe?wantedCollections=app.bsk
 
 logger = logging.getLogger(__name__)
 
+# Printable ASCII that JSON encoders never escape (no quote, backslash, slash
+# or HTML-sensitive characters), so it appears verbatim in a raw frame
+_FRAME_SAFE_NEEDLE = re.compile(
+    r"[\x20\x21\x23-\x25\x27-\x2e\x30-\x3b\x3d\x3f-\x5b\x5d-\x7e]+"
+)
+
+# Keyword count from which a single combined pattern is used to reject
+# non-matching posts; below it the per-keyword substring checks are cheaper
+COMBINED_PATTERN_MIN_KEYWORDS = 50
+
 
 def get_keywords(cursor):
     """Get keywords from database."""
     cursor.execute("SELECT keyword_value FROM keywords")
-    rows = cursor.fetchall()
-    if not rows:
+    # Iterate the cursor directly so no intermediate list of rows is built
+    keywords = {row[0] for row in cursor}
+    if not keywords:
         logger.info("No keywords found in database.")
         return set()
-    logger.info(f"Fetched keywords from database: {rows}")
-    return {row[0] for row in rows}
+    logger.info(f"Fetched keywords from database: {keywords}")
+    return keywords
 
 
-def stream_messages():
-    """Generator yielding messages continuously from Bluesky Jetstream."""
+def stream_raw_messages():
+    """Generator yielding raw JSON frames continuously from Bluesky Jetstream."""
     ws = websocket.create_connection(URI)
     try:
         while True:
-            message = ws.recv()
-            yield json.loads(message)
+            yield ws.recv()
     finally:
         ws.close()
 
 
 def compile_keyword_patterns(keywords: set) -> dict:
-    """Pre-compile regex patterns for all keywords."""
-    compiled = {}
-    for keyword in keywords:
-        keyword_lower = keyword.lower()
-        pattern = r"(?:^|\W)" + re.escape(keyword_lower) + r"\w{0,3}(?:\W|$)"
-        compiled[keyword] = re.compile(pattern)
-    return compiled
+    """Pre-compile regex patterns for all keywords.
+
+    Keywords, their lowercased forms and their patterns are kept in parallel
+    lists so matching walks flat lists rather than a dict's items. Large
+    keyword sets also get one combined pattern that matches wherever any
+    keyword's own pattern would. When every needle is JSON-safe they double
+    as frame needles, checked against raw frames before decoding.
+    """
+    keywords = list(keywords)
+    needles = [keyword.lower() for keyword in keywords]
+    frame_safe = all(_FRAME_SAFE_NEEDLE.fullmatch(needle) for needle in needles)
+    return {
+        "keywords": keywords,
+        "needles": needles,
+        "patterns": [keyword_pattern(needle) for needle in needles],
+        "combined": combined_keyword_pattern(needles),
+        "frame_needles": needles if frame_safe else None,
+    }
+
+
+def keyword_pattern(needle: str) -> re.Pattern:
+    """Compile the whole-word pattern for one lowercased keyword, allowing a short suffix."""
+    return re.compile(r"(?:^|\W)" + re.escape(needle) + r"\w{0,3}(?:\W|$)")
+
+
+def combined_keyword_pattern(needles: list) -> Optional[re.Pattern]:
+    """Compile one pattern matching wherever any needle's own pattern would.
+
+    Returns None below COMBINED_PATTERN_MIN_KEYWORDS, where it isn't worth it.
+    """
+    if len(needles) < COMBINED_PATTERN_MIN_KEYWORDS:
+        return None
+    # Longest first, so a shorter keyword can't shadow a longer one at the same position
+    alternation = "|".join(re.escape(needle) for needle in sorted(needles, key=len, reverse=True))
+    return re.compile(r"(?<!\w)(?:" + alternation + r")\w{0,3}(?!\w)")
+
+
+def frame_may_match(frame: str, frame_needles: list) -> bool:
+    """Return False only when no keyword can appear in a raw frame's post text.
+
+    Frame needles are never escaped by JSON, so a keyword in the decoded text
+    is always a verbatim substring of the raw frame.
+    """
+    frame_lower = frame.lower()
+    return any(needle in frame_lower for needle in frame_needles)
 
 
 def keyword_match(compiled_patterns: dict, post_text: str) -> Optional[set]:
     """Return a set of keywords that match as whole words in post_text using pre-compiled regex"""
-    if not compiled_patterns or not post_text:
+    if not compiled_patterns or not compiled_patterns.get("keywords") or not post_text:
         return None
 
     matching = set()
+    # str.lower already has an ASCII fast path in CPython; encoding to bytes and
+    # using bytes.translate measured slower for typical post lengths.
     text_lower = post_text.lower()
 
-    for keyword, pattern in compiled_patterns.items():
-        if pattern.search(text_lower):
+    # Most posts match nothing, so one combined search rules them out up front
+    combined = compiled_patterns.get("combined")
+    if combined is not None and not combined.search(text_lower):
+        return None
+
+    for keyword, needle, pattern in zip(compiled_patterns["keywords"],
+                                        compiled_patterns["needles"],
+                                        compiled_patterns["patterns"]):
+        # Cheap substring check first; the regex only runs when the keyword appears at all
+        if needle in text_lower and pattern.search(text_lower):
             matching.add(keyword)
 
     return matching if matching else None
 
 
-def stream_filtered_messages(keyword_fetcher: Callable[[], set]):
-    """Stream only messages with posts matching keywords."""
+def iter_matching_messages(keyword_fetcher: Callable[[], set], frames):
+    """Yield (message, matching keywords) for raw JSON commit frames matching keywords.
+
+    Raw frames that cannot contain any keyword are dropped before decoding,
+    which skips the JSON parse for most of the firehose.
+    """
 
     keywords = keyword_fetcher()
     compiled_patterns = compile_keyword_patterns(keywords)
     last_refresh = time.time()
     refresh_interval = 60
 
-    for msg in stream_messages():
+    for frame in frames:
         # Refresh keywords periodically
         current_time = time.time()
         if current_time - last_refresh >= refresh_interval:
@@ -89,15 +151,30 @@ def stream_filtered_messages(keyword_fetcher: Callable[[], set]):
                 logger.info(f"Keywords updated: {keywords}")
             last_refresh = current_time
 
+        frame_needles = compiled_patterns["frame_needles"]
+        if frame_needles is not None and not frame_may_match(frame, frame_needles):
+            continue
+        msg = json.loads(frame)
         if msg.get("kind") != "commit":
             continue
 
-        post_text = msg.get("commit", {}).get("record", {}).get("text", "")
+        # Guarded lookups rather than chained .get(..., {}), which would build
+        # throwaway dicts for every frame on the stream
+        commit = msg.get("commit")
+        record = commit.get("record") if commit else None
+        post_text = record.get("text", "") if record else ""
         matching_kws = keyword_match(compiled_patterns, post_text)
 
         if matching_kws:
-            msg["matching_keywords"] = list(matching_kws)
-            yield msg
+            yield msg, matching_kws
+
+
+def stream_filtered_messages(keyword_fetcher: Callable[[], set]):
+    """Stream only messages with posts matching keywords."""
+    frames = stream_raw_messages()
+    for msg, matching_kws in iter_matching_messages(keyword_fetcher, frames):
+        msg["matching_keywords"] = list(matching_kws)
+        yield msg
 
 
 if __name__ == "__main__":
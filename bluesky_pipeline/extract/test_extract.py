@@ -11,7 +11,9 @@ import pytest
 # Add parent directory to path so imports work
 sys.path.insert(0, str(Path(__file__).parent))
 
-from extract import keyword_match, compile_keyword_patterns, get_keywords, stream_messages, stream_filtered_messages
+from extract import (keyword_match, compile_keyword_patterns, get_keywords, stream_raw_messages,
+                     stream_filtered_messages,
+                     COMBINED_PATTERN_MIN_KEYWORDS, frame_may_match)
 
 
 class TestKeywordMatchBasic:
@@ -33,7 +35,7 @@ class TestKeywordMatchBasic:
         assert result is None
 
     def test_empty_keywords_set(self):
-        """Test that empty keywords dict returns None."""
+        """Test that empty compiled patterns return None."""
         result = keyword_match({}, "Any text here")
         assert result is None
 
@@ -139,36 +141,87 @@ class TestCompileKeywordPatterns:
     def test_empty_keywords_set(self):
         """Test compiling empty keywords set."""
         patterns = compile_keyword_patterns(set())
-        assert patterns == {}
+        assert patterns == {"keywords": [], "needles": [], "patterns": [], "combined": None,
+                            "frame_needles": []}
 
     def test_single_keyword(self):
         """Test compiling a single keyword."""
         patterns = compile_keyword_patterns({"python"})
-        assert "python" in patterns
-        assert hasattr(patterns["python"], "search")  # Check it's a compiled regex
+        assert patterns["keywords"] == ["python"]
+        assert hasattr(patterns["patterns"][0], "search")  # Check it's a compiled regex
 
     def test_multiple_keywords(self):
         """Test compiling multiple keywords."""
         keywords = {"python", "javascript", "rust"}
         patterns = compile_keyword_patterns(keywords)
-        assert len(patterns) == 3
-        assert all(kw in patterns for kw in keywords)
+        assert len(patterns["keywords"]) == 3
+        assert len(patterns["patterns"]) == 3
+        assert set(patterns["keywords"]) == keywords
 
     def test_keyword_with_special_chars(self):
         """Test that special regex chars are escaped."""
         keywords = {"c++", "c#", ".net"}
         patterns = compile_keyword_patterns(keywords)
         # Verify patterns compile without regex error
-        assert len(patterns) == 3
-        for pattern in patterns.values():
+        assert len(patterns["patterns"]) == 3
+        for pattern in patterns["patterns"]:
             assert hasattr(pattern, "search")
 
     def test_keyword_case_preservation(self):
-        """Test that keyword original case is preserved in dict key."""
+        """Test that keyword original case is preserved in the keyword list."""
         keywords = {"Python", "JAVASCRIPT"}
         patterns = compile_keyword_patterns(keywords)
-        assert "Python" in patterns
-        assert "JAVASCRIPT" in patterns
+        assert "Python" in patterns["keywords"]
+        assert "JAVASCRIPT" in patterns["keywords"]
+
+    def test_needles_are_lowercased(self):
+        """Test that substring needles are the lowercased keywords."""
+        patterns = compile_keyword_patterns({"Python"})
+        assert patterns["needles"] == ["python"]
+
+    def test_keywords_aligned_with_patterns(self):
+        """Test that each pattern sits at the same index as its keyword."""
+        patterns = compile_keyword_patterns({"python", "rust"})
+        for keyword, pattern in zip(patterns["keywords"], patterns["patterns"]):
+            assert pattern.search(f" {keyword} ")
+
+    def test_frame_needles_only_for_json_safe_keywords(self):
+        """Test that keywords JSON may escape disable the raw frame pre-check."""
+        assert compile_keyword_patterns({"Python", "c++"})["frame_needles"] is not None
+        assert compile_keyword_patterns({"python", "café"})["frame_needles"] is None
+        assert compile_keyword_patterns({"python", "a&b"})["frame_needles"] is None
+        assert compile_keyword_patterns({"python", 'say "hi"'})["frame_needles"] is None
+
+    def test_escaped_text_still_reaches_decoder(self):
+        """Test that a keyword next to escaped characters still passes the pre-check."""
+        frame = json.dumps({"commit": {"record": {"text": "line one\nPython\t\"quoted\""}}})
+        assert frame_may_match(frame, ["python"])
+        assert not frame_may_match(frame, ["rust"])
+
+    def test_small_keyword_set_has_no_combined_pattern(self):
+        """Test that small keyword sets skip the combined pattern."""
+        patterns = compile_keyword_patterns({"python", "rust"})
+        assert patterns["combined"] is None
+
+    def test_combined_pattern_agrees_with_per_keyword_patterns(self):
+        """Test that the combined pre-check never changes which keywords match."""
+        keywords = {f"topic{i}" for i in range(COMBINED_PATTERN_MIN_KEYWORDS)}
+        keywords |= {"py", "python", "c++", "#tag", "ice"}
+        patterns = compile_keyword_patterns(keywords)
+        assert patterns["combined"] is not None
+        without_combined = dict(patterns, combined=None)
+
+        texts = [
+            "Nothing to see here",
+            "I love python and c++",
+            "py is short for python",
+            "pythonic code",
+            "a #tag here but not a#tag",
+            "topic12s are great, topic3",
+            "icy ice iceberg",
+        ]
+        for text in texts:
+            assert keyword_match(patterns, text) == keyword_match(without_combined, text)
 
 
 class TestIntegrationExtract:
@@ -210,12 +263,12 @@ class TestGetKeywords:
 
     def test_get_keywords_with_results(self):
         """Test fetching keywords from database with results."""
-        mock_cursor = Mock()
-        mock_cursor.fetchall.return_value = [
+        mock_cursor = MagicMock()
+        mock_cursor.__iter__.return_value = iter([
             ("python",),
             ("javascript",),
             ("bluesky",)
-        ]
+        ])
 
         result = get_keywords(mock_cursor)
 
@@ -224,8 +277,8 @@ class TestGetKeywords:
 
     def test_get_keywords_empty_database(self):
         """Test fetching keywords when database has no keywords."""
-        mock_cursor = Mock()
-        mock_cursor.fetchall.return_value = []
+        mock_cursor = MagicMock()
+        mock_cursor.__iter__.return_value = iter([])
 
         result = get_keywords(mock_cursor)
 
@@ -234,8 +287,8 @@ class TestGetKeywords:
 
     def test_get_keywords_single_result(self):
         """Test fetching a single keyword."""
-        mock_cursor = Mock()
-        mock_cursor.fetchall.return_value = [("trending",)]
+        mock_cursor = MagicMock()
+        mock_cursor.__iter__.return_value = iter([("trending",)])
 
         result = get_keywords(mock_cursor)
 
@@ -243,12 +296,12 @@ class TestGetKeywords:
 
     def test_get_keywords_with_special_chars(self):
         """Test fetching keywords with special characters."""
-        mock_cursor = Mock()
-        mock_cursor.fetchall.return_value = [
+        mock_cursor = MagicMock()
+        mock_cursor.__iter__.return_value = iter([
             ("c++",),
             ("c#",),
             (".net",)
-        ]
+        ])
 
         result = get_keywords(mock_cursor)
 
@@ -256,33 +309,43 @@ class TestGetKeywords:
         assert "c#" in result
         assert ".net" in result
 
+    def test_get_keywords_streams_cursor(self):
+        """Test that rows are read from the cursor without materialising them."""
+        mock_cursor = MagicMock()
+        mock_cursor.__iter__.return_value = iter([("python",)])
+
+        get_keywords(mock_cursor)
 
-class TestStreamMessages:
-    """Tests for stream_messages function."""
+        mock_cursor.fetchall.assert_not_called()
+
+
+class TestStreamRawMessages:
+    """Tests for stream_raw_messages function."""
 
     @patch('extract.websocket.create_connection')
-    def test_stream_messages_closes_on_error(self, mock_create_connection):
+    def test_stream_raw_messages_closes_on_error(self, mock_create_connection):
         """Test that websocket closes even on error."""
         mock_ws = MagicMock()
         mock_create_connection.return_value = mock_ws
         mock_ws.recv.side_effect = Exception("Connection error")
 
         with pytest.raises(Exception):
-            list(stream_messages())
+            list(stream_raw_messages())
 
         mock_ws.close.assert_called_once()
 
+
 class TestStreamFilteredMessages:
     """Tests for stream_filtered_messages function."""
 
-    @patch('extract.stream_messages')
+    @patch('extract.stream_raw_messages')
     @patch('extract.time.time')
     def test_stream_filtered_messages_no_matching_posts(self, mock_time, mock_stream):
         """Test streaming when no posts match keywords."""
         mock_time.side_effect = [0, 1, 2]  # Simulate time progression
 
         # Non-matching post
-        mock_stream.return_value = iter([
+        mock_stream.return_value = map(json.dumps, [
             {
                 "kind": "commit",
                 "commit": {
@@ -298,14 +361,14 @@ class TestStreamFilteredMessages:
 
         assert len(results) == 0
 
-    @patch('extract.stream_messages')
+    @patch('extract.stream_raw_messages')
     @patch('extract.time.time')
     def test_stream_filtered_messages_with_matching_keywords(self, mock_time, mock_stream):
         """Test streaming with matching keywords."""
         mock_time.side_effect = [0, 1, 2]  # Simulate time progression
 
         # Matching post
-        mock_stream.return_value = iter([
+        mock_stream.return_value = map(json.dumps, [
             {
                 "kind": "commit",
                 "commit": {
@@ -322,13 +385,13 @@ class TestStreamFilteredMessages:
         assert len(results) == 1
         assert results[0]["matching_keywords"] == ["python"]
 
-    @patch('extract.stream_messages')
+    @patch('extract.stream_raw_messages')
     @patch('extract.time.time')
     def test_stream_filtered_messages_multiple_keywords_match(self, mock_time, mock_stream):
         """Test post matching multiple keywords."""
         mock_time.side_effect = [0, 1, 2]
 
-        mock_stream.return_value = iter([
+        mock_stream.return_value = map(json.dumps, [
             {
                 "kind": "commit",
                 "commit": {
@@ -345,13 +408,13 @@ class TestStreamFilteredMessages:
         assert len(results) == 1
         assert set(results[0]["matching_keywords"]) == {"python", "coding", "bluesky"}
 
-    @patch('extract.stream_messages')
+    @patch('extract.stream_raw_messages')
     @patch('extract.time.time')
     def test_stream_filtered_messages_ignores_non_commit(self, mock_time, mock_stream):
         """Test that non-commit messages are ignored."""
         mock_time.side_effect = [0, 1, 2, 3]
 
-        mock_stream.return_value = iter([
+        mock_stream.return_value = map(json.dumps, [
             {"kind": "identity"},  # Not a commit
             {
                 "kind": "commit",
@@ -366,7 +429,23 @@ class TestStreamFilteredMessages:
 
         assert len(results) == 1
 
-    @patch('extract.stream_messages')
+    @patch('extract.stream_raw_messages')
+    @patch('extract.time.time')
+    def test_stream_filtered_messages_skips_commits_without_record(self, mock_time, mock_stream):
+        """Test that commits without a record, such as deletes, are skipped."""
+        mock_time.side_effect = [0, 1, 2, 3]
+
+        mock_stream.return_value = map(json.dumps, [
+            {"kind": "commit", "commit": {"operation": "delete"}},
+            {"kind": "commit"},
+            {"kind": "commit", "commit": {"record": {"text": "python"}}}
+        ])
+
+        results = list(stream_filtered_messages(lambda: {"python"}))
+
+        assert len(results) == 1
+
+    @patch('extract.stream_raw_messages')
     @patch('extract.time.time')
     def test_stream_filtered_messages_keyword_refresh(self, mock_time, mock_stream):
         """Test that keywords are refreshed periodically."""
@@ -377,7 +456,7 @@ class TestStreamFilteredMessages:
         #   3. Second message: time.time() -> 140, triggers refresh (140-70 >= 60)
         mock_time.side_effect = [0, 70, 140]
 
-        mock_stream.return_value = iter([
+        mock_stream.return_value = map(json.dumps, [
             {"kind": "commit", "commit": {"record": {"text": "python"}}},
             {"kind": "commit", "commit": {"record": {"text": "rust"}}},
         ])
@@ -398,13 +477,13 @@ class TestStreamFilteredMessages:
         # Both messages should match after keywords are refreshed
         assert len(results) == 2
 
-    @patch('extract.stream_messages')
+    @patch('extract.stream_raw_messages')
     @patch('extract.time.time')
     def test_stream_filtered_messages_empty_keywords(self, mock_time, mock_stream):
         """Test streaming when keyword_fetcher returns empty set."""
         mock_time.side_effect = [0, 1, 2]
 
-        mock_stream.return_value = iter([
+        mock_stream.return_value = map(json.dumps, [
             {"kind": "commit", "commit": {"record": {"text": "any text"}}}
         ])
 
@@ -415,13 +494,13 @@ class TestStreamFilteredMessages:
 
         assert len(results) == 0
 
-    @patch('extract.stream_messages')
+    @patch('extract.stream_raw_messages')
     @patch('extract.time.time')
     def test_stream_filtered_messages_case_insensitive(self, mock_time, mock_stream):
         """Test that keyword matching is case-insensitive."""
         mock_time.side_effect = [0, 1, 2]
 
-        mock_stream.return_value = iter([
+        mock_stream.return_value = map(json.dumps, [
             {"kind": "commit", "commit": {"record": {"text": "I love PYTHON"}}}
         ])
 
@@ -432,3 +511,20 @@ class TestStreamFilteredMessages:
 
         assert len(results) == 1
         assert "python" in results[0]["matching_keywords"]
+
+    @patch('extract.json.loads', wraps=json.loads)
+    @patch('extract.stream_raw_messages')
+    @patch('extract.time.time')
+    def test_frames_without_keywords_are_not_decoded(self, mock_time, mock_stream, mock_loads):
+        """Test that raw frames with no keyword substring skip the JSON parse."""
+        mock_time.side_effect = [0, 1, 2, 3]
+
+        mock_stream.return_value = map(json.dumps, [
+            {"kind": "commit", "commit": {"record": {"text": "coffee talk"}}},
+            {"kind": "commit", "commit": {"record": {"text": "I love Python"}}},
+        ])
+
+        results = list(stream_filtered_messages(lambda: {"python"}))
+
+        assert len(results) == 1
+        mock_loads.assert_called_once()
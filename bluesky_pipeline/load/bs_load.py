@@ -1,93 +1,392 @@
-"""Load BlueSky data into PostgreSQL database."""
+"""Load BlueSky data into PostgreSQL database.
 
+The loader's session runs with synchronous_commit off: a commit returns before
+its WAL is flushed, so a server crash can lose the last few hundred
+milliseconds of posts. The database itself stays consistent, and lost posts are
+just missed stream messages, which the pipeline already tolerates.
+"""
+
+import io
 import logging
+import queue
+import threading
+import time
 from os import _Environ
 import psycopg2
-from psycopg2.extras import execute_batch
+from psycopg2 import sql
 
 logger = logging.getLogger(__name__)
 
+# Session settings for the bulk-load workload, applied at connection startup
+SESSION_OPTIONS = "-c synchronous_commit=off -c work_mem=64MB"
+
+# TCP keepalives, so quiet spells in the firehose don't let the connection drop
+_KEEPALIVES = {"keepalives": 1, "keepalives_idle": 30, "keepalives_interval": 10}
+
+# Connection attempts before giving up, backing off exponentially between them
+CONNECT_ATTEMPTS = 5
+_CONNECT_BACKOFF = 0.5
+_CONNECT_BACKOFF_MAX = 8
+
+# Number of queued batches between progress logs
+LOG_EVERY = 100
+
+# Number of batches written per transaction, so WAL syncs are amortised
+COMMIT_EVERY = 10
+
+# Connections written through in parallel, each by its own writer thread
+WRITER_CONNECTIONS = 4
+
+# Batches buffered for each writer thread before the stream is made to wait
+WRITE_QUEUE_SIZE = 4
+
+# Seconds a partial batch may wait for more posts before it's queued anyway
+FLUSH_AFTER = 5.0
 
-def get_db_connection(config: _Environ):
-    """Establish a database connection using environment variables."""
-    conn = psycopg2.connect(
-        dbname=config.get("DB_NAME"),
-        user=config.get("DB_USER"),
-        password=config.get("DB_PASSWORD"),
-        host=config.get("DB_HOST"),
-        port=config.get("DB_PORT", 5432)
+# Seconds a writer waits on an empty queue before committing what it has
+IDLE_COMMIT_AFTER = 1.0
+
+# Marks the end of the batch queue
+_SENTINEL = object()
+
+# Escapes for PostgreSQL's COPY text format
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+# Batch SQL, built once at import rather than on every upload
+_COPY_POSTS_SQL = """COPY bluesky_posts_stage
+    (post_uri, posted_at, author_did, text, sentiment_score, reply_uri, repost_uri)
+    FROM STDIN"""
+
+_COPY_MATCHES_SQL = "COPY matches_stage (post_uri, keyword_value) FROM STDIN"
+
+_MOVE_STAGED_SQL = """WITH inserted AS (
+        INSERT INTO bluesky_posts
+        (post_uri, posted_at, author_did, text, sentiment_score, ingested_at, reply_uri, repost_uri)
+        SELECT post_uri, posted_at, author_did, text, sentiment_score, NOW(), reply_uri, repost_uri
+        FROM bluesky_posts_stage
+        ON CONFLICT (post_uri) DO NOTHING
+        RETURNING post_uri
     )
+    INSERT INTO matches (post_uri, keyword_value)
+    SELECT s.post_uri, s.keyword_value
+    FROM matches_stage s
+    JOIN inserted USING (post_uri);
+    TRUNCATE bluesky_posts_stage, matches_stage;"""
+
+# Indexes on the loaded tables that don't back a constraint, so are safe to drop
+_SECONDARY_INDEXES_SQL = """SELECT i.schemaname, i.indexname, i.indexdef
+    FROM pg_indexes i
+    WHERE i.tablename IN ('bluesky_posts', 'matches')
+    AND i.schemaname = current_schema()
+    AND NOT EXISTS (
+        SELECT 1 FROM pg_constraint c
+        WHERE c.conname = i.indexname
+        AND c.connamespace = i.schemaname::regnamespace
+    )"""
+
+
+def get_db_connection(config: _Environ, attempts: int = CONNECT_ATTEMPTS):
+    """Establish a database connection using environment variables, retrying transient failures."""
+    connect_kwargs = {
+        "dbname": config.get("DB_NAME"),
+        "user": config.get("DB_USER"),
+        "password": config.get("DB_PASSWORD"),
+        "host": config.get("DB_HOST"),
+        "port": config.get("DB_PORT", 5432),
+        "options": SESSION_OPTIONS,
+        **_KEEPALIVES
+    }
+
+    for attempt in range(1, attempts + 1):
+        try:
+            conn = psycopg2.connect(**connect_kwargs)
+            break
+        except psycopg2.OperationalError as e:
+            if attempt == attempts:
+                raise
+            delay = min(_CONNECT_BACKOFF * 2 ** (attempt - 1), _CONNECT_BACKOFF_MAX)
+            logger.warning(f"Database connection failed ({e}), retrying in {delay}s...")
+            time.sleep(delay)
+
     logger.info("Database connection established.")
     return conn
 
 
-def upload_batch(posts, connection):
-    """Batch load posts into the database."""
-    if not posts:
-        return
+def create_staging_tables(connection):
+    """Create session-local staging tables that batches are COPYed into."""
+    cursor = connection.cursor()
+    cursor.execute(
+        """CREATE TEMP TABLE IF NOT EXISTS bluesky_posts_stage
+           (LIKE bluesky_posts INCLUDING DEFAULTS);
+           CREATE TEMP TABLE IF NOT EXISTS matches_stage
+           (post_uri VARCHAR(255), keyword_value VARCHAR(255));"""
+    )
+    connection.commit()
 
+
+def drop_secondary_indexes(connection) -> list[str]:
+    """Drop non-constraint indexes on the loaded tables, returning their definitions."""
     cursor = connection.cursor()
-    logger.info(f"Uploading batch of {len(posts)} posts to database.")
-
-    # Insert into bluesky_posts
-    execute_batch(
-        cursor,
-        """INSERT INTO bluesky_posts 
-           (post_uri, posted_at, author_did, text, sentiment_score, ingested_at, reply_uri, repost_uri)
-           VALUES (%s, %s, %s, %s, %s, NOW(), %s, %s)
-           ON CONFLICT (post_uri) DO NOTHING""",
-        [(
-            p["post_uri"],
-            p["commit"]["record"]["createdAt"],
-            p["did"],
-            p["commit"]["record"]["text"],
-            p["sentiment"],
-            p.get("commit", {}).get("record", {}).get(
-                "reply", {}).get("parent", {}).get("uri"),
-            p.get("repost_uri"),
-        ) for p in posts]
+    cursor.execute(_SECONDARY_INDEXES_SQL)
+    indexes = cursor.fetchall()
+
+    for schema, name, definition in indexes:
+        cursor.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(schema, name)))
+        # Logged in full, so the index can be rebuilt by hand if the process dies mid-load
+        logger.warning(f"Dropped index {name} for bulk load: {definition}")
+
+    connection.commit()
+    return [definition for _, _, definition in indexes]
+
+
+def restore_indexes(connection, definitions: list[str]):
+    """Recreate indexes from their definitions after a bulk load."""
+    cursor = connection.cursor()
+    for definition in definitions:
+        cursor.execute(definition)
+    connection.commit()
+    logger.info(f"Recreated {len(definitions)} indexes after bulk load.")
+
+
+def copy_value(value) -> str:
+    """Format a single value for PostgreSQL's COPY text format."""
+    if value is None:
+        return "\\N"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def to_copy_buffer(rows) -> io.StringIO:
+    """Serialise rows into an in-memory COPY text format buffer."""
+    return io.StringIO("".join(
+        "\t".join(map(copy_value, row)) + "\n" for row in rows
+    ))
+
+
+def post_row(p: dict) -> tuple:
+    """Flatten a post into a bluesky_posts_stage row."""
+    record = p["commit"]["record"]
+    reply = record.get("reply")
+    parent = reply.get("parent") if reply else None
+    return (
+        p["post_uri"],
+        record["createdAt"],
+        p["did"],
+        record["text"],
+        p["sentiment"],
+        parent.get("uri") if parent else None,
+        p.get("repost_uri"),
     )
 
-    logger.info("Inserted posts into bluesky_posts table.")
 
-    # Insert into matches (one row per keyword per post)
-    match_rows = []
-    for p in posts:
-        for keyword in p["matching_keywords"]:
-            match_rows.append((p["post_uri"], keyword))
+def upload_batch(post_rows: list, match_rows: list, cursor):
+    """Batch load flattened post and match rows into the database, without committing.
+
+    Rows are streamed into the staging tables with COPY, then both tables are
+    filled from staging in one round trip. Matches are only written for posts
+    that were actually inserted, since matches has no unique constraint to
+    stop a re-seen post's keywords being stored twice. The caller owns the
+    cursor and the commit.
+    """
+    if not post_rows:
+        return
+
+    # Per-batch logs stay at DEBUG, with lazy formatting, to keep the hot path quiet
+    logger.debug("Uploading batch of %d posts to database.", len(post_rows))
+
+    # Stage bluesky_posts rows
+    cursor.copy_expert(_COPY_POSTS_SQL, to_copy_buffer(post_rows))
 
+    # Stage matches (one row per keyword per post)
     if match_rows:
-        execute_batch(
-            cursor,
-            """INSERT INTO matches (post_uri, keyword_value)
-               VALUES (%s, %s)
-               ON CONFLICT DO NOTHING""",
-            match_rows
-        )
+        cursor.copy_expert(_COPY_MATCHES_SQL, to_copy_buffer(match_rows))
 
-        logger.info("Inserted matching keywords into matches table.")
+    # Move both stages into the real tables with a single round trip
+    cursor.execute(_MOVE_STAGED_SQL)
 
-    connection.commit()
+    logger.debug("Inserted posts and matching keywords into database.")
+
+
+def write_batches(conn, batches: queue.Queue, commit_every: int, errors: list):
+    """Upload queued batches until the sentinel, committing every `commit_every` batches.
+
+    Uncommitted batches are also committed once the queue has been empty for
+    IDLE_COMMIT_AFTER, so a slow stream doesn't leave them invisible to readers.
+    """
+    try:
+        create_staging_tables(conn)
+        cursor = conn.cursor()
+        uncommitted = 0
+
+        while True:
+            try:
+                batch = batches.get(timeout=IDLE_COMMIT_AFTER)
+            except queue.Empty:
+                if uncommitted:
+                    conn.commit()
+                    uncommitted = 0
+                continue
+            if batch is _SENTINEL:
+                break
+            upload_batch(*batch, cursor)
+            uncommitted += 1
+            if uncommitted >= commit_every:
+                conn.commit()
+                uncommitted = 0
+
+        conn.commit()
+        cursor.close()
+    except Exception as e:  # pylint: disable=broad-except
+        logger.error(f"Database writer failed: {e}")
+        errors.append(e)
+        # Leave the connection out of the aborted transaction, so it can still be used afterwards
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            pass
 
 
-def load_data(conn, posts, batch_size: int = 500):
-    """Load posts into the database in batches."""
+def queue_batch(batches: queue.Queue, batch, writer: threading.Thread, errors: list):
+    """Hand a batch to a writer thread, failing as soon as any writer has failed.
+
+    A failed writer drops its uncommitted batches, so the load stops rather
+    than carrying on with a gap in the data.
+    """
+    while True:
+        if errors:
+            raise RuntimeError("Database writer failed during the load.") from errors[0]
+        if not writer.is_alive():
+            raise RuntimeError("Database writer stopped before the load finished.")
+        try:
+            batches.put(batch, timeout=1)
+            return
+        except queue.Full:
+            continue
+
+
+def stop_writers(queues: list[queue.Queue], writers: list[threading.Thread]):
+    """Send each live writer the sentinel, then wait for every writer to finish."""
+    for batches, writer in zip(queues, writers):
+        while writer.is_alive():
+            try:
+                batches.put(_SENTINEL, timeout=1)
+                break
+            except queue.Full:
+                continue
+    for writer in writers:
+        # Writers that never started, e.g. if dropping indexes failed, have nothing to join
+        if writer.is_alive():
+            writer.join()
+
+
+def load_data(conns: list, posts, batch_size: int = 500, commit_every: int = COMMIT_EVERY,
+              bulk_mode: bool = False):
+    """Load posts into the database in batches on background writer threads.
+
+    Each connection gets its own writer thread, staging tables and bounded
+    queue, so the stream keeps being read while earlier batches are written
+    and waits only when a writer falls behind. Posts are sharded across
+    writers by post_uri, so a repeated post always goes to the writer that
+    saw it first. There, ON CONFLICT settles it against that writer's own
+    earlier commits. Two writers never insert the same post_uri at once, so
+    they can't deadlock on each other's uncommitted rows. If any writer
+    fails, the load stops with its error.
+
+    Posts are flattened into rows as they arrive, so the nested post dicts can
+    be freed straight away instead of living in the buffer until upload.
+    Repeats within a batch are dropped here, keeping the first post as
+    ON CONFLICT would.
+
+    With `bulk_mode`, for one-off backfills, secondary indexes are dropped
+    before loading and rebuilt once at the end, which is cheaper than
+    maintaining them row by row. Primary keys are kept, so ON CONFLICT
+    (post_uri) still works.
+    """
 
     logger.info("Starting data load into database...")
-    buffer = []
+    queues = [queue.Queue(maxsize=WRITE_QUEUE_SIZE) for _ in conns]
+    errors = []
+    writers = [
+        threading.Thread(
+            target=write_batches, args=(conn, batches, commit_every, errors), daemon=True
+        )
+        for conn, batches in zip(conns, queues)
+    ]
+    dropped_indexes = []
+    try:
+        if bulk_mode:
+            dropped_indexes = drop_secondary_indexes(conns[0])
+        for writer in writers:
+            writer.start()
+        _queue_posts(posts, batch_size, queues, writers, errors)
+    finally:
+        # However the load ends, writers finish, indexes come back and connections close
+        stop_writers(queues, writers)
+        try:
+            if dropped_indexes:
+                # A failed first writer has rolled back; this clears any transaction it left behind
+                conns[0].rollback()
+                restore_indexes(conns[0], dropped_indexes)
+        finally:
+            for conn in conns:
+                conn.close()
+
+    if errors:
+        raise RuntimeError("Database writer failed during the load.") from errors[0]
+
+
+def _queue_posts(posts, batch_size: int, queues: list[queue.Queue],
+                 writers: list[threading.Thread], errors: list):
+    """Flatten posts into per-writer batches and queue each batch as it fills.
+
+    A partial batch is also queued once its oldest post is FLUSH_AFTER seconds
+    old, so quiet shards don't sit on posts. The age is checked as posts
+    arrive, so a stream that stops entirely is flushed when it ends.
+    """
+    post_rows = [{} for _ in queues]
+    match_rows = [{} for _ in queues]
+    started = [0.0 for _ in queues]
+    batches_queued = 0
+    posts_queued = 0
+
+    def flush(shard: int):
+        nonlocal batches_queued, posts_queued
+        queue_batch(queues[shard], (list(post_rows[shard].values()), list(match_rows[shard])),
+                    writers[shard], errors)
+        batches_queued += 1
+        posts_queued += len(post_rows[shard])
+        post_rows[shard] = {}
+        match_rows[shard] = {}
+        if batches_queued % LOG_EVERY == 0:
+            logger.info(f"Queued {batches_queued} batches ({posts_queued} posts).")
 
     for post in posts:
-        buffer.append(post)
-        if len(buffer) >= batch_size:
-            upload_batch(buffer, conn)
-            buffer = []
+        # Same post, same writer, so concurrent writers never conflict on a post_uri
+        shard = hash(post["post_uri"]) % len(queues)
+        now = time.monotonic()
+        if not post_rows[shard]:
+            started[shard] = now
+        _buffer_post(post, post_rows[shard], match_rows[shard])
+        if len(post_rows[shard]) >= batch_size:
+            flush(shard)
+        for other in range(len(queues)):
+            if post_rows[other] and now - started[other] >= FLUSH_AFTER:
+                flush(other)
 
     logger.info("Data load complete.")
     # Flush remaining
-    if buffer:
-        upload_batch(buffer, conn)
+    for shard in range(len(queues)):
+        if post_rows[shard]:
+            flush(shard)
+
 
-    conn.close()
+def _buffer_post(post: dict, post_rows: dict, match_rows: dict):
+    """Add a post's rows to a shard's buffers, unless the post is already there."""
+    post_uri = post["post_uri"]
+    if post_uri not in post_rows:
+        post_rows[post_uri] = post_row(post)
+        match_rows.update(dict.fromkeys(
+            (post_uri, keyword) for keyword in post["matching_keywords"]
+        ))
 
 
 if __name__ == "__main__":
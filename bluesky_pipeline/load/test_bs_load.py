@@ -2,11 +2,17 @@
 # pylint: disable=unused-argument
 """Tests for bs_load module with database mocking."""
 
-from bs_load import get_db_connection, upload_batch, load_data
+from bs_load import (get_db_connection, upload_batch, load_data, copy_value, to_copy_buffer, post_row,
+                     drop_secondary_indexes, restore_indexes, write_batches, _SENTINEL)
+import itertools
+import logging
+import queue
 import sys
+import threading
 from pathlib import Path
 from unittest.mock import Mock, MagicMock, patch, call
 
+import psycopg2
 import pytest
 
 # Add load directory to path
@@ -38,7 +44,11 @@ class TestGetDbConnection:
             user="testuser",
             password="testpass",
             host="localhost",
-            port="5432"
+            port="5432",
+            options="-c synchronous_commit=off -c work_mem=64MB",
+            keepalives=1,
+            keepalives_idle=30,
+            keepalives_interval=10
         )
 
     @patch('bs_load.psycopg2.connect')
@@ -79,138 +89,220 @@ class TestGetDbConnection:
         call_args = mock_connect.call_args[1]
         assert call_args["port"] == "3306"
 
+    @patch('bs_load.psycopg2.connect')
+    def test_connection_disables_synchronous_commit(self, mock_connect):
+        """Test that the session is tuned for bulk loading at connect time."""
+        get_db_connection({"DB_NAME": "testdb"})
+
+        call_args = mock_connect.call_args[1]
+        assert "synchronous_commit=off" in call_args["options"]
+
+    @patch('bs_load.time.sleep')
+    @patch('bs_load.psycopg2.connect')
+    def test_connection_retries_with_backoff(self, mock_connect, mock_sleep):
+        """Test that transient connection failures are retried with growing delays."""
+        mock_conn = Mock()
+        mock_connect.side_effect = [
+            psycopg2.OperationalError("down"),
+            psycopg2.OperationalError("down"),
+            mock_conn,
+        ]
+
+        assert get_db_connection({"DB_NAME": "testdb"}) == mock_conn
+        assert mock_connect.call_count == 3
+        assert [c.args[0] for c in mock_sleep.call_args_list] == [0.5, 1.0]
+
+    @patch('bs_load.time.sleep')
+    @patch('bs_load.psycopg2.connect', side_effect=psycopg2.OperationalError("down"))
+    def test_connection_gives_up_after_attempts(self, mock_connect, mock_sleep):
+        """Test that the last connection error is raised once attempts run out."""
+        with pytest.raises(psycopg2.OperationalError):
+            get_db_connection({"DB_NAME": "testdb"}, attempts=3)
+
+        assert mock_connect.call_count == 3
+        assert mock_sleep.call_count == 2
+
 
 class TestUploadBatch:
     """Tests for upload_batch function."""
 
     def test_empty_batch(self):
         """Test that empty batch is handled gracefully."""
-        mock_conn = Mock()
-        upload_batch([], mock_conn)
+        mock_cursor = MagicMock()
+        upload_batch([], [], mock_cursor)
 
         # Should return early without cursor operations
-        mock_conn.cursor.assert_not_called()
+        mock_cursor.copy_expert.assert_not_called()
+        mock_cursor.execute.assert_not_called()
 
-    @patch('bs_load.execute_batch')
-    def test_single_post_batch(self, mock_execute_batch):
+    def test_single_post_batch(self):
         """Test uploading a batch with a single post."""
         mock_cursor = MagicMock()
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
 
-        posts = [
-            {
-                "post_uri": "at://did:plc:123/app.bsky.feed.post/abc123",
-                "commit": {
-                    "record": {
-                        "createdAt": "2026-02-03T15:00:00Z",
-                        "text": "Test post",
-                        "reply": {}
-                    }
-                },
-                "did": "did:plc:123",
-                "sentiment": 0.5,
-                "matching_keywords": ["test"],
-                "repost_uri": None
-            }
+        post_rows = [
+            ("at://did:plc:123/app.bsky.feed.post/abc123", "2026-02-03T15:00:00Z",
+             "did:plc:123", "Test post", 0.5, None, None)
         ]
+        match_rows = [("at://did:plc:123/app.bsky.feed.post/abc123", "test")]
 
-        upload_batch(posts, mock_conn)
+        upload_batch(post_rows, match_rows, mock_cursor)
 
-        mock_conn.cursor.assert_called_once()
-        assert mock_execute_batch.call_count == 2  # posts + matches
-        mock_conn.commit.assert_called_once()
+        assert mock_cursor.copy_expert.call_count == 2  # posts + matches
 
-    @patch('bs_load.execute_batch')
-    def test_batch_with_multiple_posts(self, mock_execute_batch):
-        """Test uploading batch with multiple posts."""
+    def test_batch_without_matches(self):
+        """Test that the matches COPY is skipped when there are no match rows."""
         mock_cursor = MagicMock()
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
 
-        posts = [
-            {
-                "post_uri": "at://did:plc:1/app.bsky.feed.post/a1",
-                "commit": {"record": {"createdAt": "2026-02-03T15:00:00Z", "text": "Post 1", "reply": {}}},
-                "did": "did:plc:1",
-                "sentiment": 0.5,
-                "matching_keywords": ["keyword1"],
-                "repost_uri": None
-            },
-            {
-                "post_uri": "at://did:plc:2/app.bsky.feed.post/a2",
-                "commit": {"record": {"createdAt": "2026-02-03T15:01:00Z", "text": "Post 2", "reply": {}}},
-                "did": "did:plc:2",
-                "sentiment": -0.3,
-                "matching_keywords": ["keyword2"],
-                "repost_uri": None
-            },
+        post_rows = [
+            ("at://did:plc:1/app.bsky.feed.post/a1", "2026-02-03T15:00:00Z",
+             "did:plc:1", "Post", 0.5, None, None)
         ]
 
-        upload_batch(posts, mock_conn)
+        upload_batch(post_rows, [], mock_cursor)
 
-        # execute_batch should be called twice (once for posts, once for matches)
-        assert mock_execute_batch.call_count == 2
-        mock_conn.commit.assert_called_once()
+        assert mock_cursor.copy_expert.call_count == 1
+        mock_cursor.execute.assert_called_once()
 
-    @patch('bs_load.execute_batch')
-    def test_batch_with_multiple_keywords_per_post(self, mock_execute_batch):
-        """Test that multiple keywords per post create multiple match rows."""
+    def test_batch_with_multiple_keywords_per_post(self):
+        """Test that every match row is staged in a single COPY."""
         mock_cursor = MagicMock()
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
 
-        posts = [
-            {
-                "post_uri": "at://did:plc:1/app.bsky.feed.post/a1",
-                "commit": {"record": {"createdAt": "2026-02-03T15:00:00Z", "text": "Post", "reply": {}}},
-                "did": "did:plc:1",
-                "sentiment": 0.5,
-                "matching_keywords": ["kw1", "kw2", "kw3"],
-                "repost_uri": None
-            }
+        post_rows = [
+            ("at://did:plc:1/app.bsky.feed.post/a1", "2026-02-03T15:00:00Z",
+             "did:plc:1", "Post", 0.5, None, None)
+        ]
+        match_rows = [
+            ("at://did:plc:1/app.bsky.feed.post/a1", "kw1"),
+            ("at://did:plc:1/app.bsky.feed.post/a1", "kw2"),
+            ("at://did:plc:1/app.bsky.feed.post/a1", "kw3"),
         ]
 
-        upload_batch(posts, mock_conn)
+        upload_batch(post_rows, match_rows, mock_cursor)
 
-        # execute_batch called twice
-        assert mock_execute_batch.call_count == 2
-        mock_conn.commit.assert_called_once()
+        # One COPY for posts, one for all three match rows
+        assert mock_cursor.copy_expert.call_count == 2
+        match_buffer = mock_cursor.copy_expert.call_args_list[1].args[1]
+        assert len(match_buffer.getvalue().splitlines()) == 3
 
-    @patch('bs_load.execute_batch')
-    def test_batch_with_reply_uri(self, mock_execute_batch):
-        """Test post with reply_uri information."""
+    def test_posts_copied_through_staging_table(self):
+        """Test that posts are COPYed to staging and moved over with ON CONFLICT."""
         mock_cursor = MagicMock()
-        mock_conn = Mock()
-        mock_conn.cursor.return_value = mock_cursor
 
-        posts = [
-            {
-                "post_uri": "at://did:plc:1/app.bsky.feed.post/a1",
-                "commit": {
-                    "record": {
-                        "createdAt": "2026-02-03T15:00:00Z",
-                        "text": "Reply text",
-                        "reply": {
-                            "parent": {
-                                "uri": "at://did:plc:0/app.bsky.feed.post/parent123"
-                            }
-                        }
-                    }
-                },
-                "did": "did:plc:1",
-                "sentiment": 0.0,
-                "matching_keywords": ["test"],
-                "repost_uri": None
-            }
+        post_rows = [
+            ("at://did:plc:1/app.bsky.feed.post/a1", "2026-02-03T15:00:00Z",
+             "did:plc:1", "Post", 0.5, None, None)
         ]
 
-        upload_batch(posts, mock_conn)
+        upload_batch(post_rows, [("at://did:plc:1/app.bsky.feed.post/a1", "test")], mock_cursor)
+
+        copy_sql, posts_buffer = mock_cursor.copy_expert.call_args_list[0].args
+        assert "COPY bluesky_posts_stage" in copy_sql
+        assert posts_buffer.getvalue() == (
+            "at://did:plc:1/app.bsky.feed.post/a1\t2026-02-03T15:00:00Z\t"
+            "did:plc:1\tPost\t0.5\t\\N\t\\N\n"
+        )
+        mock_cursor.execute.assert_called_once()  # both tables moved in one round trip
+        insert_sql = mock_cursor.execute.call_args.args[0]
+        assert "FROM bluesky_posts_stage" in insert_sql
+        assert "ON CONFLICT (post_uri) DO NOTHING" in insert_sql
+        assert "FROM matches_stage" in insert_sql
+        assert "JOIN inserted USING (post_uri)" in insert_sql  # matches only for new posts
+
+
+class TestCopyFormatting:
+    """Tests for COPY text format helpers."""
+
+    def test_none_is_null_marker(self):
+        assert copy_value(None) == "\\N"
+
+    def test_special_characters_escaped(self):
+        assert copy_value("a\tb\nc\\d\re") == "a\\tb\\nc\\\\d\\re"
+
+    def test_numbers_formatted_as_text(self):
+        assert copy_value(-0.3) == "-0.3"
+
+    def test_buffer_has_one_line_per_row(self):
+        buffer = to_copy_buffer([("a", None), ("b", "c")])
+        assert buffer.getvalue() == "a\t\\N\nb\tc\n"
+
+
+class TestPostRow:
+    """Tests for post_row function."""
+
+    def test_row_without_reply(self):
+        post = {
+            "post_uri": "at://did:plc:1/app.bsky.feed.post/a",
+            "did": "did:plc:1",
+            "sentiment": 0.5,
+            "commit": {"record": {"createdAt": "2026-01-01T00:00:00Z", "text": "hi"}}
+        }
+        assert post_row(post) == (
+            "at://did:plc:1/app.bsky.feed.post/a", "2026-01-01T00:00:00Z",
+            "did:plc:1", "hi", 0.5, None, None
+        )
+
+    def test_row_with_reply_parent(self):
+        post = {
+            "post_uri": "at://did:plc:1/app.bsky.feed.post/b",
+            "did": "did:plc:1",
+            "sentiment": 0.0,
+            "commit": {"record": {
+                "createdAt": "2026-01-01T00:00:00Z",
+                "text": "re",
+                "reply": {"parent": {"uri": "at://did:plc:2/app.bsky.feed.post/p"}}
+            }}
+        }
+        assert post_row(post)[5] == "at://did:plc:2/app.bsky.feed.post/p"
+
+
+class TestBulkModeIndexes:
+    """Tests for dropping and restoring indexes around a bulk load."""
+
+    def test_drop_returns_definitions(self):
+        mock_conn = Mock()
+        mock_cursor = mock_conn.cursor.return_value
+        definition = "CREATE INDEX idx_posted ON public.bluesky_posts USING btree (posted_at)"
+        mock_cursor.fetchall.return_value = [("public", "idx_posted", definition)]
+
+        assert drop_secondary_indexes(mock_conn) == [definition]
+        # One lookup plus one DROP per index
+        assert mock_cursor.execute.call_count == 2
+        mock_conn.commit.assert_called_once()
+
+    def test_drop_logs_definitions(self, caplog):
+        """Test that dropped definitions are logged, so they can be rebuilt by hand."""
+        mock_conn = Mock()
+        definition = "CREATE INDEX idx_posted ON public.bluesky_posts USING btree (posted_at)"
+        mock_conn.cursor.return_value.fetchall.return_value = [("public", "idx_posted", definition)]
+
+        with caplog.at_level(logging.WARNING, logger="bs_load"):
+            drop_secondary_indexes(mock_conn)
+
+        assert definition in caplog.text
+
+    def test_restore_runs_each_definition(self):
+        mock_conn = Mock()
+        definitions = ["CREATE INDEX a ON t (x)", "CREATE INDEX b ON t (y)"]
+
+        restore_indexes(mock_conn, definitions)
 
-        mock_execute_batch.assert_called()
+        mock_conn.cursor.return_value.execute.assert_has_calls(
+            [call(definitions[0]), call(definitions[1])])
         mock_conn.commit.assert_called_once()
 
 
+def make_post(i: int, keywords: list = None) -> dict:
+    """Build a minimal transformed post."""
+    return {
+        "post_uri": f"at://did:plc:{i}/app.bsky.feed.post/a{i}",
+        "commit": {"record": {"createdAt": "2026-02-03T15:00:00Z", "text": f"Post {i}", "reply": {}}},
+        "did": f"did:plc:{i}",
+        "sentiment": 0.0,
+        "matching_keywords": keywords or ["test"],
+        "repost_uri": None
+    }
+
+
 class TestLoadData:
     """Tests for load_data function."""
 
@@ -234,7 +326,7 @@ class TestLoadData:
             for post in posts:
                 yield post
 
-        load_data(mock_conn, mock_post_generator(), batch_size=100)
+        load_data([mock_conn], mock_post_generator(), batch_size=100)
 
         # Should flush remaining batch at end
         mock_upload.assert_called_once()
@@ -262,7 +354,7 @@ class TestLoadData:
                 yield post
 
         with patch('bs_load.upload_batch') as mock_upload:
-            load_data(mock_conn, mock_post_generator(), batch_size=5)
+            load_data([mock_conn], mock_post_generator(), batch_size=5)
 
             # Should call upload_batch at least once
             assert mock_upload.call_count >= 1
@@ -288,7 +380,7 @@ class TestLoadData:
                 yield post
 
         with patch('bs_load.upload_batch') as mock_upload:
-            load_data(mock_conn, mock_post_generator(), batch_size=3)
+            load_data([mock_conn], mock_post_generator(), batch_size=3)
 
             # With 10 posts and batch size 3: 3 full batches + 1 remaining = 4 calls
             assert mock_upload.call_count == 4
@@ -302,7 +394,7 @@ class TestLoadData:
             return
             yield
 
-        load_data(mock_conn, mock_post_generator(), batch_size=100)
+        load_data([mock_conn], mock_post_generator(), batch_size=100)
 
         mock_conn.close.assert_called_once()
 
@@ -315,7 +407,231 @@ class TestLoadData:
             yield
 
         with patch('bs_load.upload_batch') as mock_upload:
-            load_data(mock_conn, empty_generator(), batch_size=100)
+            load_data([mock_conn], empty_generator(), batch_size=100)
 
             mock_upload.assert_not_called()
             mock_conn.close.assert_called_once()
+
+    def test_load_creates_staging_tables(self):
+        """Test that staging tables are created before any batch is uploaded."""
+        mock_conn = Mock()
+        mock_cursor = MagicMock()
+        mock_conn.cursor.return_value = mock_cursor
+
+        with patch('bs_load.upload_batch'):
+            load_data([mock_conn], iter([]), batch_size=100)
+
+        create_sql = mock_cursor.execute.call_args_list[0].args[0]
+        assert "CREATE TEMP TABLE IF NOT EXISTS bluesky_posts_stage" in create_sql
+        assert "CREATE TEMP TABLE IF NOT EXISTS matches_stage" in create_sql
+
+    def test_load_commits_every_n_batches(self):
+        """Test that batches are grouped into transactions of commit_every batches."""
+        mock_conn = Mock()
+        posts = [make_post(i) for i in range(7)]
+
+        with patch('bs_load.upload_batch') as mock_upload:
+            load_data([mock_conn], iter(posts), batch_size=1, commit_every=3)
+
+        assert mock_upload.call_count == 7
+        # Staging setup, two full groups of three, then the final commit for the remainder
+        assert mock_conn.commit.call_count == 4
+        mock_conn.close.assert_called_once()
+
+    def test_load_queues_partial_batches_after_flush_age(self):
+        """Test that a partial batch is queued once it's old enough, not only when full."""
+        posts = [make_post(i) for i in range(3)]
+
+        with patch('bs_load.upload_batch') as mock_upload, patch('bs_load.FLUSH_AFTER', 0):
+            load_data([Mock()], iter(posts), batch_size=100)
+
+        assert [len(c.args[0]) for c in mock_upload.call_args_list] == [1, 1, 1]
+
+    def test_load_reuses_one_cursor(self):
+        """Test that every batch is uploaded through the same cursor."""
+        mock_conn = Mock()
+        posts = [make_post(i) for i in range(4)]
+
+        with patch('bs_load.upload_batch') as mock_upload:
+            load_data([mock_conn], iter(posts), batch_size=2)
+
+        cursors = {upload_call.args[2] for upload_call in mock_upload.call_args_list}
+        assert cursors == {mock_conn.cursor.return_value}
+        mock_conn.cursor.return_value.close.assert_called_once()
+
+    def test_load_uploads_on_writer_thread(self):
+        """Test that batches are written off the thread reading the stream."""
+        mock_conn = Mock()
+        upload_threads = []
+        posts = [make_post(i) for i in range(3)]
+
+        with patch('bs_load.upload_batch',
+                   side_effect=lambda *args: upload_threads.append(threading.current_thread())):
+            load_data([mock_conn], iter(posts), batch_size=1)
+
+        assert len(upload_threads) == 3
+        assert threading.current_thread() not in upload_threads
+
+    def test_load_raises_when_writer_fails(self):
+        """Test that a failed write is raised to the caller instead of hanging."""
+        mock_conn = Mock()
+        posts = [make_post(i) for i in range(20)]
+
+        with patch('bs_load.upload_batch', side_effect=psycopg2.OperationalError("gone")):
+            with pytest.raises(RuntimeError):
+                load_data([mock_conn], iter(posts), batch_size=1)
+
+    def test_load_stops_when_one_writer_fails(self):
+        """Test that the stream stops as soon as any writer fails, not once all have."""
+        failing, healthy = Mock(), Mock()
+
+        def upload(post_rows, match_rows, cursor):
+            if cursor is failing.cursor.return_value:
+                raise psycopg2.errors.DeadlockDetected("deadlock")
+
+        endless = (make_post(i) for i in itertools.count())
+        with patch('bs_load.upload_batch', side_effect=upload):
+            with pytest.raises(RuntimeError) as excinfo:
+                load_data([failing, healthy], endless, batch_size=1)
+
+        assert isinstance(excinfo.value.__cause__, psycopg2.errors.DeadlockDetected)
+        failing.rollback.assert_called()
+        healthy.close.assert_called_once()
+
+    def test_load_sends_each_post_to_one_writer(self):
+        """Test that repeats of a post always reach the same writer."""
+        mock_conns = [Mock(), Mock(), Mock()]
+        writers_by_uri = {}
+        posts = [make_post(i % 5) for i in range(30)]
+
+        def upload(post_rows, match_rows, cursor):
+            for row in post_rows:
+                writers_by_uri.setdefault(row[0], set()).add(id(cursor))
+
+        with patch('bs_load.upload_batch', side_effect=upload):
+            load_data(mock_conns, iter(posts), batch_size=1)
+
+        assert len(writers_by_uri) == 5
+        assert all(len(writers) == 1 for writers in writers_by_uri.values())
+
+    def test_load_writes_through_every_connection(self):
+        """Test that each connection gets a writer with its own staging tables."""
+        mock_conns = [Mock(), Mock()]
+        posts = [make_post(i) for i in range(6)]
+
+        with patch('bs_load.upload_batch') as mock_upload:
+            load_data(mock_conns, iter(posts), batch_size=1)
+
+        assert mock_upload.call_count == 6
+        for mock_conn in mock_conns:
+            create_sql = mock_conn.cursor.return_value.execute.call_args_list[0].args[0]
+            assert "CREATE TEMP TABLE IF NOT EXISTS bluesky_posts_stage" in create_sql
+            mock_conn.commit.assert_called()
+            mock_conn.close.assert_called_once()
+
+    def test_load_flattens_and_dedupes_posts(self):
+        """Test that posts are queued as rows, with repeats dropped within a batch."""
+        mock_conn = Mock()
+        first = make_post(1, ["python", "python", "rust"])
+        repeat = dict(first, sentiment=0.9)
+
+        with patch('bs_load.upload_batch') as mock_upload:
+            load_data([mock_conn], iter([first, repeat, make_post(2)]), batch_size=100)
+
+        post_rows, match_rows, _ = mock_upload.call_args.args
+        assert post_rows == [post_row(first), post_row(make_post(2))]
+        assert match_rows == [
+            (first["post_uri"], "python"),
+            (first["post_uri"], "rust"),
+            (make_post(2)["post_uri"], "test"),
+        ]
+
+    @patch('bs_load.restore_indexes')
+    @patch('bs_load.drop_secondary_indexes', return_value=["CREATE INDEX a ON t (x)"])
+    def test_bulk_mode_rebuilds_indexes_after_load(self, mock_drop, mock_restore):
+        """Test that bulk mode drops indexes first and restores them before closing."""
+        mock_conn = Mock()
+
+        with patch('bs_load.upload_batch'):
+            load_data([mock_conn], iter([make_post(1)]), batch_size=100, bulk_mode=True)
+
+        mock_drop.assert_called_once_with(mock_conn)
+        mock_restore.assert_called_once_with(mock_conn, ["CREATE INDEX a ON t (x)"])
+        mock_conn.close.assert_called_once()
+
+    @patch('bs_load.restore_indexes')
+    @patch('bs_load.drop_secondary_indexes', return_value=["CREATE INDEX a ON t (x)"])
+    def test_bulk_mode_restores_indexes_when_stream_fails(self, mock_drop, mock_restore):
+        """Test that a failing stream still gets indexes rebuilt and connections closed."""
+        mock_conns = [Mock(), Mock()]
+
+        def failing_stream():
+            yield make_post(1)
+            raise ConnectionError("stream dropped")
+
+        with patch('bs_load.upload_batch'):
+            with pytest.raises(ConnectionError):
+                load_data(mock_conns, failing_stream(), batch_size=1, bulk_mode=True)
+
+        mock_restore.assert_called_once_with(mock_conns[0], ["CREATE INDEX a ON t (x)"])
+        for mock_conn in mock_conns:
+            mock_conn.close.assert_called_once()
+
+    @patch('bs_load.restore_indexes')
+    @patch('bs_load.drop_secondary_indexes', return_value=["CREATE INDEX a ON t (x)"])
+    def test_bulk_mode_restores_indexes_after_writer_failure(self, mock_drop, mock_restore):
+        """Test that a failed writer's connection is rolled back before indexes are rebuilt."""
+        mock_conn = Mock()
+        mock_conn.attach_mock(mock_restore, "restore")
+        posts = [make_post(i) for i in range(20)]
+
+        deadlock = psycopg2.errors.DeadlockDetected("deadlock")
+        with patch('bs_load.upload_batch', side_effect=deadlock):
+            with pytest.raises(RuntimeError) as excinfo:
+                load_data([mock_conn], iter(posts), batch_size=1, bulk_mode=True)
+
+        assert isinstance(excinfo.value.__cause__, psycopg2.errors.DeadlockDetected)
+        method_names = [name for name, _, _ in mock_conn.method_calls]
+        restore_at = method_names.index("restore")
+        assert "rollback" in method_names[:restore_at]
+        mock_conn.close.assert_called_once()
+
+    @patch('bs_load.drop_secondary_indexes')
+    def test_indexes_kept_by_default(self, mock_drop):
+        with patch('bs_load.upload_batch'):
+            load_data([Mock()], iter([make_post(1)]), batch_size=100)
+
+        mock_drop.assert_not_called()
+
+    def test_load_logs_progress_every_n_batches(self, caplog):
+        """Test that progress is logged per LOG_EVERY batches rather than per batch."""
+        posts = [make_post(i) for i in range(5)]
+
+        with patch('bs_load.upload_batch'), patch('bs_load.LOG_EVERY', 2):
+            with caplog.at_level(logging.INFO, logger="bs_load"):
+                load_data([Mock()], iter(posts), batch_size=1)
+
+        progress = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Queued")]
+        assert progress == ["Queued 2 batches (2 posts).", "Queued 4 batches (4 posts)."]
+
+
+class TestWriteBatches:
+    """Tests for write_batches function."""
+
+    def test_writer_commits_when_queue_is_idle(self):
+        """Test that a writer commits pending batches while waiting on an empty queue."""
+        mock_conn = Mock()
+        batches = queue.Queue()
+        uploaded = threading.Event()
+        committed = threading.Event()
+        mock_conn.commit.side_effect = lambda: uploaded.is_set() and committed.set()
+        batches.put(([post_row(make_post(1))], []))
+
+        with patch('bs_load.upload_batch', side_effect=lambda *args: uploaded.set()), \
+                patch('bs_load.IDLE_COMMIT_AFTER', 0.01):
+            writer = threading.Thread(target=write_batches, args=(mock_conn, batches, 10, []))
+            writer.start()
+            # Committed long before commit_every batches, and before the sentinel
+            assert committed.wait(timeout=5)
+            batches.put(_SENTINEL)
+            writer.join()
@@ -1,15 +1,14 @@
 # pylint: disable=import-error
 """Main pipeline: Extract -> Transform -> Load."""
 
-from bs_load import load_data, get_db_connection
-from bs_transform import add_sentiment, add_uri
+from bs_load import load_data, get_db_connection, WRITER_CONNECTIONS
+from bs_transform import enrich, FastSentimentIntensityAnalyzer
 from extract import stream_filtered_messages, get_keywords
 import sys
 import logging
 from pathlib import Path
 from os import environ as ENV
 from dotenv import load_dotenv
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 # Add subdirectories to path
 sys.path.insert(0, str(Path(__file__).parent / "extract"))
@@ -28,6 +27,9 @@ if __name__ == "__main__":
 
     load_dotenv()
     conn = get_db_connection(ENV)
+    # Keyword lookups are read-only, so don't hold a transaction open between them
+    conn.autocommit = True
+    writer_conns = [get_db_connection(ENV) for _ in range(WRITER_CONNECTIONS)]
 
     def keyword_updater():
         """Function to get updated keywords from environment."""
@@ -38,17 +40,14 @@ if __name__ == "__main__":
     extracted = stream_filtered_messages(keyword_updater)
     logger.info("Completed extraction of messages.")
 
-    # 2. Transform: add sentiment scores
-    analyzer = SentimentIntensityAnalyzer()
-    with_sentiment = add_sentiment(extracted, analyzer)
-    logger.info("Completed sentiment analysis.")
+    # 2. Transform: add sentiment scores and post URIs in one pass
+    analyzer = FastSentimentIntensityAnalyzer()
+    enriched = enrich(extracted, analyzer)
+    logger.info("Added sentiment scores and URIs to posts.")
 
-    # 3. Transform: add post URIs
-    with_uri = add_uri(with_sentiment)
-    logger.info("Added URIs to posts.")
-
-    # 4. Load posts
-    load_data(conn, with_uri, batch_size=500)
+    # 3. Load posts
+    load_data(writer_conns, enriched, batch_size=500)
     logger.info("Loaded data into database.")
-    # for post in with_uri:
+    conn.close()
+    # for post in enriched:
     #     print(post)
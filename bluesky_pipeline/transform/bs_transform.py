@@ -1,20 +1,115 @@
 """Enriches extracted data with sentiment analysis."""
 
+import string
+from functools import lru_cache
+from itertools import repeat
+
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+# Recent texts whose scores are kept, since reposted and templated posts repeat
+SENTIMENT_CACHE_SIZE = 20_000
+
+
+class FastSentimentIntensityAnalyzer(SentimentIntensityAnalyzer):
+    """VADER analyzer that lowercases only the words its context checks read.
+
+    VADER's negation and idiom checks lowercase the whole post on every call,
+    up to four times per sentiment word, though they only read the three words
+    either side. These overrides pass that window to the original checks,
+    with the index shifted to match, so scores are unchanged.
+
+    The overrides depend on vaderSentiment 3.3.2's private internals, which
+    is why reqs_pipeline.txt pins that version.
+    """
+
+    @staticmethod
+    def _negation_check(valence, words_and_emoticons, start_i, i):
+        start = max(i - 3, 0)
+        return SentimentIntensityAnalyzer._negation_check(
+            valence, words_and_emoticons[start:i], start_i, i - start)
+
+    @staticmethod
+    def _special_idioms_check(valence, words_and_emoticons, i):
+        start = max(i - 3, 0)
+        return SentimentIntensityAnalyzer._special_idioms_check(
+            valence, words_and_emoticons[start:i + 3], i - start)
+
+
+def could_have_sentiment(text: str, lexicon_words: frozenset, emoji_chars: frozenset) -> bool:
+    """Return False only when VADER is certain to score text as neutral.
+
+    VADER gives every word outside its lexicon a valence of 0, so a post with no
+    lexicon words (raw or punctuation-stripped, as VADER tokenises them) and no
+    emojis always has a compound score of 0.0.
+    """
+    if not emoji_chars.isdisjoint(text):
+        return True
+    tokens = text.lower().split()
+    # Set disjointness checks keep the per-token loop in C
+    return not (lexicon_words.isdisjoint(tokens)
+                and lexicon_words.isdisjoint(map(str.strip, tokens, repeat(string.punctuation))))
+
+
+def sentiment_scorer(analyzer):
+    """Return a function giving VADER's compound score for a text, skipping neutral texts.
+
+    Scores are cached by text, so repeated posts are only scored once.
+    """
+    lexicon_words = frozenset(analyzer.lexicon)
+    # VADER swaps emojis for their descriptions a character at a time
+    emoji_chars = frozenset(emoji for emoji in analyzer.emojis if len(emoji) == 1)
+    polarity_scores = analyzer.polarity_scores
+
+    @lru_cache(maxsize=SENTIMENT_CACHE_SIZE)
+    def score(text: str) -> float:
+        if could_have_sentiment(text, lexicon_words, emoji_chars):
+            return polarity_scores(text)["compound"]
+        return 0.0
+
+    return score
+
 
 def add_sentiment(stream, analyzer):
-    """Add sentiment score to each post."""
+    """Add sentiment score to each post, skipping VADER for posts with no sentiment words."""
+    score = sentiment_scorer(analyzer)
     for post in stream:
-        post["sentiment"] = analyzer.polarity_scores(
-            post["commit"]["record"]["text"])["compound"]
+        post["sentiment"] = score(post["commit"]["record"]["text"])
         yield post
 
 
+def build_post_uri(post: dict) -> str:
+    """Build a post's unique at:// URI from its author DID and rkey."""
+    # Both keys are present on firehose posts, so plain subscripts with a
+    # fallback beat .get() calls on the common path
+    try:
+        did = post["did"]
+    except KeyError:
+        did = ""
+    try:
+        rkey = post["commit"]["rkey"]
+    except (KeyError, TypeError):
+        rkey = ""
+    # An f-string measured faster here than "".join or concatenation
+    return f"at://{did}/app.bsky.feed.post/{rkey}"
+
+
 def add_uri(stream):
     """Add a unique URI to each post based on author DID and rkey."""
     for post in stream:
-        did = post.get("did", "")
-        rkey = post.get("commit", {}).get("rkey", "")
-        post["post_uri"] = f"at://{did}/app.bsky.feed.post/{rkey}"
+        post["post_uri"] = build_post_uri(post)
+        yield post
+
+
+def enrich(stream, analyzer):
+    """Add sentiment score and URI to each post in a single pass.
+
+    Equivalent to add_uri(add_sentiment(stream, analyzer)), but each post goes
+    through one generator instead of two.
+    """
+    score = sentiment_scorer(analyzer)
+    for post in stream:
+        post["sentiment"] = score(post["commit"]["record"]["text"])
+        post["post_uri"] = build_post_uri(post)
         yield post
 
 
@@ -3,12 +3,15 @@
 """Tests for bs_transform module."""
 
 import sys
+from importlib.metadata import version
 from pathlib import Path
+from unittest.mock import patch
 
 # Add transform directory to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from bs_transform import add_sentiment, add_uri
+from bs_transform import (add_sentiment, add_uri, could_have_sentiment, enrich,
+                          FastSentimentIntensityAnalyzer)
 
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
@@ -155,6 +158,63 @@ def test_sentiment_score_range():
         assert -1 <= result["sentiment"] <= 1, f"Sentiment {result['sentiment']} out of range"
 
 
+def test_neutral_post_skips_vader():
+    """Test that a post with no lexicon words or emojis is scored 0.0 without VADER."""
+    analyzer = SentimentIntensityAnalyzer()
+    fake_stream = [{"commit": {"record": {"text": "Meeting at 3pm in the town hall"}}}]
+
+    with patch.object(analyzer, "polarity_scores") as mock_scores:
+        results = list(add_sentiment(fake_stream, analyzer))
+
+    mock_scores.assert_not_called()
+    assert results[0]["sentiment"] == 0.0
+
+
+def test_could_have_sentiment_catches_lexicon_words_and_emojis():
+    """Test that punctuated lexicon words and emojis are sent to VADER."""
+    analyzer = SentimentIntensityAnalyzer()
+    lexicon_words = frozenset(analyzer.lexicon)
+    emoji_chars = frozenset(e for e in analyzer.emojis if len(e) == 1)
+
+    assert could_have_sentiment("Great!!", lexicon_words, emoji_chars)
+    assert could_have_sentiment("see you :)", lexicon_words, emoji_chars)
+    assert could_have_sentiment("release day \U0001F600", lexicon_words, emoji_chars)
+    assert not could_have_sentiment("release day", lexicon_words, emoji_chars)
+
+
+def test_add_sentiment_matches_vader_scores():
+    """Test that skipping neutral posts never changes a score."""
+    analyzer = SentimentIntensityAnalyzer()
+    texts = [
+        "Meeting at 3pm",
+        "I am NOT happy about this...",
+        "no problem at all",
+        "kind of meh, at least it works",
+        "the bomb",
+        "Release notes: v2.1 ships today \U0001F389",
+        "rust and python",
+        "",
+    ]
+
+    fake_stream = [{"commit": {"record": {"text": t}}} for t in texts]
+    results = list(add_sentiment(fake_stream, analyzer))
+
+    assert [r["sentiment"] for r in results] == [
+        analyzer.polarity_scores(t)["compound"] for t in texts]
+
+
+def test_repeated_text_scored_once():
+    """Test that identical post texts reuse the cached score."""
+    analyzer = SentimentIntensityAnalyzer()
+    fake_stream = [{"commit": {"record": {"text": "I love this!"}}} for _ in range(3)]
+
+    with patch.object(analyzer, "polarity_scores", return_value={"compound": 0.6}) as mock_scores:
+        results = list(add_sentiment(fake_stream, analyzer))
+
+    mock_scores.assert_called_once_with("I love this!")
+    assert [r["sentiment"] for r in results] == [0.6, 0.6, 0.6]
+
+
 def test_add_uri_chaining():
     """Test that add_uri preserves all original post data."""
     fake_stream = [
@@ -198,3 +258,41 @@ def test_transform_pipeline_integration():
     assert "post_uri" in with_uri[0]
     assert with_uri[0]["sentiment"] > 0.5
     assert with_uri[0]["post_uri"] == "at://did:plc:123/app.bsky.feed.post/abc123"
+
+
+def test_enrich_matches_chained_generators():
+    """Test that the fused pass gives the same posts as add_uri(add_sentiment(...))."""
+    analyzer = SentimentIntensityAnalyzer()
+
+    def make_stream():
+        return [
+            {"did": "did:plc:123", "commit": {"rkey": "abc123", "record": {"text": "I love this!"}}},
+            {"did": "did:plc:456", "commit": {"rkey": "def456", "record": {"text": "Meeting at 3pm"}}},
+            {"commit": {"record": {"text": "No author"}}},
+        ]
+
+    assert list(enrich(make_stream(), analyzer)) == list(add_uri(add_sentiment(make_stream(), analyzer)))
+
+
+def test_fast_analyzer_matches_vader():
+    """Test that the windowed negation and idiom checks leave scores unchanged."""
+    # The overrides mirror private VADER internals, so re-verify them before any upgrade
+    assert version("vaderSentiment") == "3.3.2", (
+        "FastSentimentIntensityAnalyzer was written against vaderSentiment 3.3.2; "
+        "re-check its _negation_check and _special_idioms_check overrides before upgrading"
+    )
+    texts = [
+        "I don't really like it but it is ok",
+        "never so good, without doubt great",
+        "this is not the bomb at all",
+        "yeah right, the shit is to die for",
+        "kind of bad, sort of nice",
+        "no no good",
+        "Best day EVER!!! :)",
+        "It isn't terrible and it isn't great either, honestly kind of meh",
+    ]
+    vader = SentimentIntensityAnalyzer()
+    fast = FastSentimentIntensityAnalyzer()
+
+    for text in texts:
+        assert fast.polarity_scores(text) == vader.polarity_scores(text)
@@ -12,9 +12,11 @@ def login_prompt():
         st.stop()
 
 
+@st.cache_resource
 def get_boto3_client():
     """Create SES client. Uses explicit keys for local dev,
-    falls back to ECS task role credentials when deployed."""
+    falls back to ECS task role credentials when deployed.
+    Cached, since the client is thread-safe and slow to build on every rerun."""
     access_key = os.getenv('AWS_ACCESS_KEY')
     secret_key = os.getenv('AWS_SECRET_KEY')
 
@@ -4,16 +4,15 @@
 import logging
 import streamlit as st
 from streamlit import session_state as ss
-from psycopg2.extras import RealDictCursor
 
 # Import shared utilities
-from db_utils import get_db_connection, get_db_connection_cleanup
+from db_utils import db_cursor, get_db_connection, get_db_connection_cleanup
 from auth_utils import (
-    get_user_by_username,
     authenticate_user,
     generate_password_hash,
     validate_signup_input,
-    create_user
+    create_user,
+    prepare_password_hashing
 )
 
 logging.basicConfig(level=logging.INFO)
@@ -72,19 +71,15 @@ def render_login_tab() -> None:
     with col1:
         if st.button("Login", type="primary", use_container_width=True):
             if login_username and login_password:
-                cursor = conn.cursor(cursor_factory=RealDictCursor)
-                is_authenticated = authenticate_user(cursor, login_username, login_password)
-                cursor.close()
+                # The authenticated row already has the user's details, so no second lookup
+                with db_cursor() as cursor:
+                    user = authenticate_user(cursor, login_username, login_password)
+                if user:
+                    set_user_session(user, conn)
+                else:
+                    st.error("Invalid username or password.")
             else:
                 st.error("Please enter both username and password.")
-            if is_authenticated:
-                cursor = conn.cursor(cursor_factory=RealDictCursor)
-                user = get_user_by_username(cursor, login_username)
-                cursor.close()
-                set_user_session(user, conn)
-
-            else:
-                st.error("Invalid username or password.")
 
 def new_account_fields() -> tuple:
     """Create input fields for new account registration and return the values."""
@@ -118,10 +113,11 @@ def render_get_new_account() -> None:
                 # Hash the password and create the user
                 password_hash = generate_password_hash(signup_password)
                 conn = get_db_connection()
-                cursor = conn.cursor(cursor_factory=RealDictCursor)
-                user_created = create_user(cursor, signup_email, password_hash)
-                user = get_user_by_username(cursor, signup_email)
-                cursor.close()
+                with db_cursor() as cursor:
+                    user = create_user(cursor, signup_email, password_hash)
+                if user is None:
+                    # create_user has already shown the error
+                    return
 
                 ss.logged_in = True
                 ss.username = signup_name.split()[0]
@@ -173,6 +169,8 @@ if __name__ == "__main__":
 
     configure_page()
     initialize_session_state()
+    # One-off per process: calibration and the dummy hash are cached after the first run
+    prepare_password_hashing()
 
     if not st.session_state.logged_in:
         show_login_page()
@@ -9,8 +9,11 @@ hmac — prevents timing attacks during comparison
 import hashlib
 import hmac
 import logging
+import os
 import re
 import secrets
+import threading
+import time
 from typing import Optional
 
 import psycopg2
@@ -18,17 +21,63 @@ import streamlit as st
 
 logger = logging.getLogger(__name__)
 
+# Recent successful verifications, so repeated logins skip the PBKDF2 rehash.
+# Failures are never cached, so every wrong guess pays the full hash.
+# Keys hold an HMAC of the password under a per-process secret, never the password itself
+VERIFY_CACHE_SIZE = 128
+_VERIFY_CACHE_SECRET = secrets.token_bytes(32)
+_verify_cache: dict[tuple[str, bytes], bool] = {}
+# Sessions run on separate script threads, so every cache access holds this lock
+_verify_cache_lock = threading.Lock()
+
+# PBKDF2 cost for new hashes: calibrated to the target time on this host, never below the floor.
+# PBKDF2_ITERATIONS overrides it, but below the floor only when PBKDF2_ALLOW_WEAK is also set
+# (conftest does, for fast tests), so a stray override can't weaken production hashes
+PBKDF2_MIN_ITERATIONS = 100000
+PBKDF2_TARGET_SECONDS = 0.25
+
+# Basic email format check, compiled once at import
+EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
+
 
 def get_user_by_username(cursor, email: str) -> Optional[dict]:
-    """Retrieve user details from database by username."""
-    query = "SELECT * FROM users WHERE email = %s"
+    """Retrieve user details from database by username, ignoring case."""
+    # Matches the lower(email) index, so the lookup stays an index scan
+    query = "SELECT user_id, email, password_hash FROM users WHERE LOWER(email) = LOWER(%s)"
     cursor.execute(query, (email,))
     result = cursor.fetchone()
     return result
 
 
+def clear_verify_cache() -> None:
+    """Forget cached password verifications, e.g. on logout."""
+    with _verify_cache_lock:
+        _verify_cache.clear()
+
+
 def verify_password(stored_hash: str, entered_password: str) -> bool:
-    """Verify if entered password matches the stored hash. Uses PBKDF2-SHA256 for password hashing."""
+    """Verify if entered password matches the stored hash, caching recent successes."""
+    key = (
+        stored_hash,
+        hmac.new(_VERIFY_CACHE_SECRET, entered_password.encode("utf-8"), "sha256").digest()
+    )
+    with _verify_cache_lock:
+        if key in _verify_cache:
+            return True
+
+    # Hashed outside the lock, so one login's PBKDF2 never holds up another's lookup
+    result = _verify_pbkdf2(stored_hash, entered_password)
+    if result:
+        with _verify_cache_lock:
+            if key not in _verify_cache and len(_verify_cache) >= VERIFY_CACHE_SIZE:
+                # Evict the oldest entry, since dicts keep insertion order
+                del _verify_cache[next(iter(_verify_cache))]
+            _verify_cache[key] = True
+    return result
+
+
+def _verify_pbkdf2(stored_hash: str, entered_password: str) -> bool:
+    """Check a password against a stored hash using PBKDF2-SHA256."""
     parts = stored_hash.split("$")
     if len(parts) != 3:
         return False
@@ -53,21 +102,91 @@ def verify_password(stored_hash: str, entered_password: str) -> bool:
     return hmac.compare_digest(hashed.hex(), stored_hash_hex)
 
 
-def authenticate_user(cursor, username: str, password: str) -> bool:
-    """Authenticate user by checking username and password."""
+def authenticate_user(cursor, username: str, password: str) -> Optional[dict]:
+    """Authenticate user by checking username and password, returning their row on success."""
     user = get_user_by_username(cursor, username)
 
     if user is None:
-        return False
+        # Do the same PBKDF2 work as a real check, so timing doesn't reveal which emails exist
+        verify_password(_dummy_password_hash(), password)
+        return None
+
+    if not verify_password(user["password_hash"], password):
+        return None
+
+    if needs_rehash(user["password_hash"]):
+        rehash_password(cursor, user["user_id"], password)
+
+    return user
+
+
+def needs_rehash(stored_hash: str) -> bool:
+    """Whether a stored hash is cheaper than new hashes, so should be upgraded on login.
+
+    Only weaker hashes are upgraded. Calibration varies slightly between
+    processes, so rehashing on any difference would flip-flop between them.
+    """
+    iterations = stored_hash.split("$")[1]
+    return iterations.isdigit() and int(iterations) < password_hash_iterations()
+
+
+def rehash_password(cursor, user_id: int, password: str) -> None:
+    """Store a fresh hash of a just-verified password at the current iteration count."""
+    try:
+        cursor.execute(
+            "UPDATE users SET password_hash = %s WHERE user_id = %s",
+            (generate_password_hash(password), user_id)
+        )
+        cursor.connection.commit()
+    except psycopg2.Error as e:
+        # The login itself succeeded; the upgrade is retried on the next one
+        logger.error(f"Database error rehashing password: {e}")
+        cursor.connection.rollback()
+
+
+@st.cache_resource
+def calibrated_iterations(target_seconds: float = PBKDF2_TARGET_SECONDS) -> int:
+    """Pick the PBKDF2 iteration count that takes about `target_seconds` on this host.
+
+    PBKDF2 time is linear in iterations, so one timed run at the floor is
+    enough to scale from. Measured once per process.
+    """
+    start = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", b"calibration", b"calibration", PBKDF2_MIN_ITERATIONS)
+    elapsed = time.perf_counter() - start
 
-    return verify_password(user["password_hash"], password)
+    iterations = round(PBKDF2_MIN_ITERATIONS * target_seconds / elapsed, -3)
+    iterations = max(PBKDF2_MIN_ITERATIONS, int(iterations))
+    logger.info(f"Calibrated PBKDF2 to {iterations} iterations.")
+    return iterations
 
 
-def generate_password_hash(password: str, iterations: int = 100000) -> str:
-    """Generate a password hash using PBKDF2-SHA256."""
+def password_hash_iterations() -> int:
+    """Iteration count for new hashes: the env override if set, else this host's calibration."""
+    override = os.environ.get("PBKDF2_ITERATIONS")
+    if not override:
+        return calibrated_iterations()
+    iterations = int(override)
+    if iterations < PBKDF2_MIN_ITERATIONS and not os.environ.get("PBKDF2_ALLOW_WEAK"):
+        logger.warning(
+            f"PBKDF2_ITERATIONS={iterations} is below the floor; using {PBKDF2_MIN_ITERATIONS}."
+        )
+        return PBKDF2_MIN_ITERATIONS
+    return iterations
+
+
+def generate_password_hash(password: str, iterations: Optional[int] = None) -> str:
+    """Generate a password hash using PBKDF2-SHA256.
+
+    The iteration count is stored in the hash, so verify_password handles
+    hashes made before or after a calibration change.
+    """
     if not password:
         raise ValueError("Password cannot be empty")
 
+    if iterations is None:
+        iterations = password_hash_iterations()
+
     # Generate a random salt
     salt = secrets.token_hex(16)
 
@@ -83,37 +202,53 @@ def generate_password_hash(password: str, iterations: int = 100000) -> str:
     return f"{salt}${iterations}${hashed.hex()}"
 
 
+@st.cache_resource
+def _dummy_password_hash() -> str:
+    """Hash of a random password, checked against when a login's user doesn't exist.
+
+    Made at the same iteration count as new hashes. Older hashes are upgraded
+    to that count on login, so real accounts converge on the dummy's cost.
+    """
+    return generate_password_hash(secrets.token_hex(16))
+
+
+def prepare_password_hashing() -> None:
+    """Calibrate PBKDF2 and build the dummy hash now, so no login request pays for either."""
+    calibrated_iterations()
+    _dummy_password_hash()
+
+
 def validate_signup_input(email: str, password: str) -> bool:
     """Validate signup input: email format and password length."""
     if not email or not password:
         return False
 
-    # Validate email format (basic check)
-    email_pattern = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
-    if not re.match(email_pattern, email):
+    # Validate password length first, so short passwords skip the regex
+    if len(password) <= 8:
         return False
 
-    # Validate password length
-    if len(password) <= 8:
+    # Validate email format (basic check)
+    if not EMAIL_PATTERN.match(email):
         return False
 
     return True
 
 
-def create_user(cursor, email: str, password_hash: str) -> bool:
-    """Insert a new user into the database."""
+def create_user(cursor, email: str, password_hash: str) -> Optional[dict]:
+    """Insert a new user into the database, returning their row on success."""
     try:
-        query = "INSERT INTO users (email, password_hash) VALUES (%s, %s)"
+        query = "INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING user_id, email"
         cursor.execute(query, (email, password_hash))
+        user = cursor.fetchone()
         cursor.connection.commit()
-        return True
+        return user
     except psycopg2.IntegrityError:
         # Email already exists
         cursor.connection.rollback()
         st.error("Email already exists. Please use a different email.")
-        return False
+        return None
     except psycopg2.Error as e:
         logger.error(f"Database error creating user: {e}")
         st.error("Database error occurred. Please try again later.")
         cursor.connection.rollback()
-        return False
+        return None
@@ -11,6 +11,10 @@ import hashlib
 from datetime import datetime, timedelta, date
 import psycopg2
 
+# Cheap PBKDF2 for tests; production leaves this unset and calibrates instead
+os.environ.setdefault("PBKDF2_ITERATIONS", "1000")
+os.environ.setdefault("PBKDF2_ALLOW_WEAK", "1")
+
 
 # ============== Authentication & User Fixtures ==============
 
@@ -20,17 +24,17 @@ def mock_cursor():
     return Mock()
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def valid_password():
     "Valid password string for authentication tests."
     return "test_password_123"
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def password_hash(valid_password):
-    "Valid PBKDF2-SHA256 password hash for password verification tests."
+    "Valid PBKDF2-SHA256 password hash, derived once per test session."
     salt = "test_salt_value"
-    iterations = 100000
+    iterations = int(os.environ["PBKDF2_ITERATIONS"])
     hashed = hashlib.pbkdf2_hmac(
         "sha256",
         valid_password.encode("utf-8"),
@@ -2,11 +2,14 @@
 
 import logging
 import os
+from contextlib import contextmanager
 from typing import Optional
 
 import psycopg2
 import streamlit as st
 from dotenv import load_dotenv
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +25,10 @@ DB_CONFIG = {
     "password": os.environ.get("DB_PASSWORD")
 }
 
+# Connections shared by short queries across all sessions
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 8
+
 
 @st.cache_resource
 def get_db_connection() -> Optional[psycopg2.extensions.connection]:
@@ -37,6 +44,43 @@ def get_db_connection() -> Optional[psycopg2.extensions.connection]:
     return conn
 
 
+@st.cache_resource
+def get_db_pool() -> ThreadedConnectionPool:
+    """Get the connection pool shared by every session in the app."""
+    pool = ThreadedConnectionPool(
+        POOL_MIN_CONNECTIONS,
+        POOL_MAX_CONNECTIONS,
+        host=DB_CONFIG.get("host"),
+        port=DB_CONFIG.get("port", 5432),
+        database=DB_CONFIG.get("database"),
+        user=DB_CONFIG.get("user"),
+        password=DB_CONFIG.get("password")
+    )
+    logger.info("Database connection pool created.")
+    return pool
+
+
+@contextmanager
+def db_cursor():
+    """Borrow a pooled connection for one unit of work, committing if it succeeds.
+
+    Unlike the shared session connection, a failed query here is rolled back
+    before the connection goes back to the pool, so it can't leave other
+    sessions in an aborted transaction.
+    """
+    pool = get_db_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            yield cursor
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
 @st.cache_resource
 def get_db_connection_cleanup():
     """Register cleanup for database connection on app exit."""
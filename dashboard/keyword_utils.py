@@ -2,6 +2,9 @@
 
 import streamlit as st
 
+# Tries at mapping a keyword, for when another session adds the same new keyword concurrently
+ADD_KEYWORD_ATTEMPTS = 2
+
 
 @st.cache_data(ttl=3600)
 def get_user_keywords(_cursor, user_id: int) -> list:
@@ -15,29 +18,45 @@ def get_user_keywords(_cursor, user_id: int) -> list:
 
 
 def add_user_keyword(cursor, user_id: int, keyword: str) -> bool:
-    """Add a keyword to a user's tracked keywords."""
-    # Insert keyword into keywords table (case-insensitive, do nothing on conflict)
-    cursor.execute(
-        "INSERT INTO keywords (keyword_value) VALUES (LOWER(%s)) ON CONFLICT (keyword_value) DO NOTHING",
-        (keyword,)
-    )
+    """Add a keyword to a user's tracked keywords, returning False if it couldn't be mapped."""
+    # Keywords are stored lowercase, so fold case once here rather than in SQL
+    keyword = keyword.lower()
+    # Insert the keyword if it's new and map it to the user in one round trip.
+    # The outer SELECT can't see the CTE's insert, so exactly one branch yields the id.
+    # If another session commits the same new keyword mid-statement, the insert
+    # conflicts but the SELECT's snapshot predates the row, so nothing is mapped.
+    # A retry is a new statement with a fresh snapshot, which does see it
+    for _ in range(ADD_KEYWORD_ATTEMPTS):
+        cursor.execute(
+            """WITH inserted AS (
+                   INSERT INTO keywords (keyword_value) VALUES (%s)
+                   ON CONFLICT (keyword_value) DO NOTHING
+                   RETURNING keyword_id
+               )
+               INSERT INTO user_keywords (user_id, keyword_id)
+               SELECT %s, keyword_id FROM inserted
+               UNION ALL
+               SELECT %s, keyword_id FROM keywords WHERE keyword_value = %s""",
+            (keyword, user_id, user_id, keyword)
+        )
+        if cursor.rowcount:
+            break
+    else:
+        cursor.connection.rollback()
+        return False
 
-    # Add entry to user_keywords table mapping user to keyword
-    cursor.execute(
-        "INSERT INTO user_keywords (user_id, keyword_id) SELECT %s, keyword_id FROM keywords WHERE LOWER(keyword_value) = LOWER(%s)",
-        (user_id, keyword)
-    )
     cursor.connection.commit()
-    get_user_keywords.clear()
+    # Drop only this user's cached list, so other sessions keep theirs
+    get_user_keywords.clear(cursor, user_id)
     return True
 
 
 def remove_user_keyword(cursor, user_id: int, keyword: str) -> bool:
     """Remove a keyword from a user's tracked keywords."""
     cursor.execute(
-        "DELETE FROM user_keywords WHERE user_id = %s AND keyword_id IN (SELECT keyword_id FROM keywords WHERE LOWER(keyword_value) = LOWER(%s))",
-        (user_id, keyword)
+        "DELETE FROM user_keywords WHERE user_id = %s AND keyword_id IN (SELECT keyword_id FROM keywords WHERE keyword_value = %s)",
+        (user_id, keyword.lower())
     )
     cursor.connection.commit()
-    get_user_keywords.clear()
+    get_user_keywords.clear(cursor, user_id)
     return True
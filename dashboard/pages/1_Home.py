@@ -79,10 +79,13 @@ def render_add_keyword_section():
                 # Add to database
                 conn = get_db_connection()
                 cursor = conn.cursor(cursor_factory=RealDictCursor)
-                add_user_keyword(
+                added = add_user_keyword(
                     cursor, ss.user_id, new_keyword)
                 conn.commit()
                 cursor.close()
+                if not added:
+                    st.error(f"Couldn't add '{new_keyword}'. Please try again.")
+                    return
                 ss.keywords.append(new_keyword)
                 st.success(
                     f"Added '{new_keyword}' to your keywords!")
@@ -112,10 +115,11 @@ def render_keywords_display():
     if not keywords:
         st.info("No keywords added yet. Add some above to start tracking!")
 
+    # One template lookup for the whole grid, not one per keyword
+    styling = load_html_template("styling/keywords_gradient.html")
     cols = st.columns(4)
     for i, keyword in enumerate(keywords):
         with cols[i % 4]:
-            styling = load_html_template("styling/keywords_gradient.html")
             st.markdown(styling.format(keyword=keyword),
                         unsafe_allow_html=True)
 
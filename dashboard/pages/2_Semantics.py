@@ -67,6 +67,12 @@ def get_keyword_word_cloud_data(_conn, keyword: str, day_limit: int = 7) -> dict
     }
 
 
+@st.cache_data(ttl=600)
+def get_calendar_sentiment(_conn, keyword: str, day_limit: int) -> list[dict]:
+    """Fetch daily sentiment for the calendar, reused across reruns."""
+    return get_sentiment_by_day(_conn, keyword, day_limit=day_limit)
+
+
 # ---------- HELPERS ----------
 
 def normalize_word_freq(word_data: dict) -> dict:
@@ -136,7 +142,7 @@ def render_sentiment_calendar(keyword: str, days: int = 30):
     last_of_month = (today.replace(month=today.month + 1, day=1) - timedelta(days=1)
                      if today.month < 12 else today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1))
     days_in_month = (last_of_month - first_of_month).days + 1
-    sentiment_data = get_sentiment_by_day(
+    sentiment_data = get_calendar_sentiment(
         conn, keyword, day_limit=days_in_month + (today - first_of_month).days)
 
     all_dates = pd.date_range(start=first_of_month,
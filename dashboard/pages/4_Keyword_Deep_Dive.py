@@ -156,9 +156,8 @@ def get_sentiment_distribution(keyword: str, days: int) -> pd.DataFrame:
 
 def sentiment_counts(df_sentiment: pd.DataFrame) -> tuple:
     """Return positive and negative counts."""
-    pos = df_sentiment[df_sentiment["sentiment"] == "Positive"]["count"].sum()
-    neg = df_sentiment[df_sentiment["sentiment"] == "Negative"]["count"].sum()
-    return pos, neg
+    counts = df_sentiment.groupby("sentiment")["count"].sum()
+    return counts.get("Positive", 0), counts.get("Negative", 0)
 
 
 def compute_kpi_metrics(df_daily: pd.DataFrame, df_sentiment: pd.DataFrame) -> dict | None:
@@ -167,10 +166,12 @@ def compute_kpi_metrics(df_daily: pd.DataFrame, df_sentiment: pd.DataFrame) -> d
         return None
     total_sentiment = df_sentiment["count"].sum()
     positive_count, negative_count = sentiment_counts(df_sentiment)
+    # Sum the count columns in one reduction rather than one per column
+    totals = df_daily[["total", "posts", "replies"]].sum()
     return {
-        "total_mentions": int(df_daily["total"].sum()),
-        "posts": int(df_daily["posts"].sum()),
-        "replies": int(df_daily["replies"].sum()),
+        "total_mentions": int(totals["total"]),
+        "posts": int(totals["posts"]),
+        "replies": int(totals["replies"]),
         "avg_sentiment": float(df_daily["avg_sentiment"].mean()),
         "pct_positive": float(positive_count / total_sentiment) if total_sentiment else 0,
         "pct_negative": float(negative_count / total_sentiment) if total_sentiment else 0,
@@ -184,25 +185,15 @@ def format_dates(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def daily_long(df_daily: pd.DataFrame) -> pd.DataFrame:
-    """Return long-form daily metrics sorted by date."""
-    df_long = df_daily.melt(
-        id_vars=["date"],
-        value_vars=["posts", "replies", "total"],
-        var_name="type",
-        value_name="count"
-    )
-    return df_long.sort_values("date")
-
-
 def render_activity_over_time(df_daily: pd.DataFrame, keyword: str):
     """Render a multi-line chart for activity over time."""
     if df_daily.empty:
         st.warning(f"No data available for '{keyword}' in the last period")
         return None
-    df_long = daily_long(format_dates(df_daily)).sort_values("date")
     return (
-        alt.Chart(df_long)
+        alt.Chart(format_dates(df_daily))
+        # Fold the metric columns into type/count in the browser, instead of melting a copy here
+        .transform_fold(["posts", "replies", "total"], as_=["type", "count"])
         .mark_line(point=True)
         .encode(
             x=alt.X("date:T", title="Date", axis=alt.Axis(format="%b %d"), sort="ascending"),
@@ -251,19 +251,28 @@ def render_controls():
     return metric, days
 
 
-def get_summary_data(df: pd.DataFrame, keyword: str) -> dict:
-    """Calculate summary statistics for a given keyword."""
-    kw_data = df[df['keyword'] == keyword]
-
-    return {
-        'Total Posts': kw_data['post_count'].sum(),
-        'Avg Posts/Day': (kw_data['post_count'].sum() / max(1, len(kw_data))).round(2),
-        'Post Count Volatility': kw_data['post_count'].std().round(2),
-        'Avg Sentiment': kw_data['avg_sentiment'].mean().round(2),
-        'Sentiment Max': kw_data['avg_sentiment'].max().round(2),
-        'Sentiment Min': kw_data[kw_data['avg_sentiment'] != 0]['avg_sentiment'].min().round(2),
-        'Sentiment Volatility': kw_data['avg_sentiment'].std().round(2)
-    }
+def get_summary_data(df: pd.DataFrame, keywords: list) -> dict:
+    """Calculate summary statistics for each keyword in one grouped pass."""
+    posts = df.groupby('keyword')['post_count']
+    sentiment = df.groupby('keyword')['avg_sentiment']
+    nonzero_sentiment = df[df['avg_sentiment'] != 0].groupby('keyword')['avg_sentiment']
+
+    summary = pd.DataFrame({
+        'Total Posts': posts.sum(),
+        'Avg Posts/Day': posts.sum() / posts.size(),
+        'Post Count Volatility': posts.std(),
+        'Avg Sentiment': sentiment.mean(),
+        'Sentiment Max': sentiment.max(),
+        'Sentiment Min': nonzero_sentiment.min(),
+        'Sentiment Volatility': sentiment.std()
+    }).round(2).reindex(keywords)
+
+    # Keywords with no rows have no posts, rather than unknown ones
+    summary['Total Posts'] = summary['Total Posts'].fillna(0).astype(int)
+    summary['Avg Posts/Day'] = summary['Avg Posts/Day'].fillna(0.0)
+
+    # Object dtype keeps Total Posts an int when rows are read out
+    return summary.astype(object).to_dict('index')
 
 
 def create_table() -> None:
@@ -277,10 +286,7 @@ def create_table() -> None:
 
 
 def render_summary_statistics(df: pd.DataFrame, metric: str):
-    summary_data = {}  # Store numeric values for highlighting
-
-    for kw in selected_keywords:
-        summary_data[kw] = get_summary_data(df, kw)
+    summary_data = get_summary_data(df, selected_keywords)  # Store numeric values for highlighting
 
     metrics = ['Total Posts', 'Avg Posts/Day', 'Post Count Volatility',
                'Avg Sentiment', 'Sentiment Max', 'Sentiment Min', 'Sentiment Volatility']
@@ -33,6 +33,10 @@ from alerts import (
 class TestGetBoto3Client:
     """Tests for get_boto3_client function."""
 
+    def setup_method(self):
+        # Clear cache to force function to execute
+        get_boto3_client.clear()
+
     @patch.dict(os.environ, {
         "AWS_ACCESS_KEY": "test_access_key",
         "AWS_SECRET_KEY": "test_secret_key",
@@ -78,6 +82,15 @@ class TestGetBoto3Client:
         call_kwargs = mock_boto_client.call_args[1]
         assert call_kwargs['region_name'] == 'ap-southeast-1'
 
+    @patch("alerts.boto3.client")
+    def test_reuses_client_across_calls(self, mock_boto_client):
+        """Test that reruns reuse the cached client instead of building a new one."""
+        first = get_boto3_client()
+        second = get_boto3_client()
+
+        assert first is second
+        mock_boto_client.assert_called_once()
+
 
 # ============== Tests for is_email_verified ==============
 
@@ -1,10 +1,18 @@
 # pylint: disable=missing-function-docstring, import-error
 """Tests for auth_utils module."""
 
+import threading
 import pytest
 from unittest.mock import Mock, patch
 
-from auth_utils import generate_password_hash, validate_signup_input, verify_password
+import auth_utils
+from auth_utils import (
+    calibrated_iterations,
+    clear_verify_cache,
+    generate_password_hash,
+    validate_signup_input,
+    verify_password,
+)
 
 
 # ============== Tests for generate_password_hash ==============
@@ -35,6 +43,73 @@ class TestGeneratePasswordHashExtended:
         assert len(parts) == 3
         assert parts[1].isdigit()  # iterations should be numeric
 
+    def test_default_iterations_are_calibrated(self, monkeypatch):
+        """Test that new hashes use the calibrated iteration count."""
+        monkeypatch.delenv("PBKDF2_ITERATIONS", raising=False)
+        with patch("auth_utils.calibrated_iterations", return_value=123000):
+            result = generate_password_hash("password123")
+
+        assert result.split("$")[1] == "123000"
+
+    def test_iterations_env_override(self, monkeypatch):
+        """Test that PBKDF2_ITERATIONS replaces the calibrated count."""
+        monkeypatch.setenv("PBKDF2_ITERATIONS", "2000")
+        with patch("auth_utils.calibrated_iterations") as mock_calibrated:
+            result = generate_password_hash("password123")
+
+        assert result.split("$")[1] == "2000"
+        mock_calibrated.assert_not_called()
+
+    def test_weak_override_is_clamped_to_floor(self, monkeypatch):
+        """Test that an override below the floor is ignored unless weak hashes are allowed."""
+        monkeypatch.setenv("PBKDF2_ITERATIONS", "2000")
+        monkeypatch.delenv("PBKDF2_ALLOW_WEAK", raising=False)
+
+        assert auth_utils.password_hash_iterations() == auth_utils.PBKDF2_MIN_ITERATIONS
+
+    def test_override_above_floor_is_kept(self, monkeypatch):
+        """Test that an override above the floor applies without the weak flag."""
+        monkeypatch.setenv("PBKDF2_ITERATIONS", "250000")
+        monkeypatch.delenv("PBKDF2_ALLOW_WEAK", raising=False)
+
+        assert auth_utils.password_hash_iterations() == 250000
+
+
+# ============== Tests for calibrated_iterations ==============
+
+class TestCalibratedIterations:
+    """Tests for calibrated_iterations function."""
+
+    def setup_method(self):
+        calibrated_iterations.clear()
+
+    def teardown_method(self):
+        calibrated_iterations.clear()
+
+    def test_scales_to_target_time(self):
+        """Test that a fast host gets proportionally more iterations."""
+        # The floor run measures 0.05s, so 0.25s needs 5x the floor
+        with patch("auth_utils.time.perf_counter", side_effect=[0.0, 0.05]):
+            result = calibrated_iterations(0.25)
+
+        assert result == auth_utils.PBKDF2_MIN_ITERATIONS * 5
+
+    def test_never_below_floor(self):
+        """Test that a slow host still gets the minimum iteration count."""
+        with patch("auth_utils.time.perf_counter", side_effect=[0.0, 2.0]):
+            result = calibrated_iterations(0.25)
+
+        assert result == auth_utils.PBKDF2_MIN_ITERATIONS
+
+    def test_prepare_password_hashing_warms_both_caches(self):
+        """Test that startup builds the calibration and the dummy hash up front."""
+        with patch("auth_utils.calibrated_iterations") as mock_calibrated, \
+                patch("auth_utils._dummy_password_hash") as mock_dummy:
+            auth_utils.prepare_password_hashing()
+
+        mock_calibrated.assert_called_once()
+        mock_dummy.assert_called_once()
+
 
 # ============== Tests for verify_password ==============
 
@@ -143,6 +218,73 @@ class TestVerifyPassword:
         with pytest.raises(AttributeError):
             verify_password(password_hash, None)
 
+    def test_verify_password_repeat_skips_rehash(self):
+        """Test that a repeated verification is answered from the cache."""
+        password_hash = generate_password_hash("password123")
+        verify_password(password_hash, "password123")
+
+        with patch("auth_utils.hashlib.pbkdf2_hmac") as mock_pbkdf2:
+            assert verify_password(password_hash, "password123") is True
+            mock_pbkdf2.assert_not_called()
+
+    def test_verify_cache_does_not_store_password(self):
+        """Test that cache keys never hold the raw password."""
+        password_hash = generate_password_hash("password123")
+        verify_password(password_hash, "password123")
+
+        for key in auth_utils._verify_cache:
+            assert "password123" not in key
+            assert b"password123" not in key
+
+    def test_verify_cache_is_bounded(self):
+        """Test that the cache evicts old entries beyond its size."""
+        for i in range(auth_utils.VERIFY_CACHE_SIZE + 10):
+            password_hash = generate_password_hash(f"password{i}", iterations=1)
+            verify_password(password_hash, f"password{i}")
+
+        assert len(auth_utils._verify_cache) == auth_utils.VERIFY_CACHE_SIZE
+
+    def test_failed_verification_is_not_cached(self):
+        """Test that a wrong password pays the full hash every time."""
+        password_hash = generate_password_hash("password123", iterations=1)
+        verify_password(password_hash, "wrong_password")
+
+        assert password_hash not in {stored for stored, _ in auth_utils._verify_cache}
+        with patch("auth_utils.hashlib.pbkdf2_hmac", return_value=b"") as mock_pbkdf2:
+            assert verify_password(password_hash, "wrong_password") is False
+            mock_pbkdf2.assert_called_once()
+
+    def test_verify_cache_is_thread_safe(self):
+        """Test that concurrent logins can fill and evict the cache without errors."""
+        hashes = [(generate_password_hash(f"pw{i}", iterations=1), f"pw{i}") for i in range(400)]
+        errors = []
+
+        def login_many(offset):
+            try:
+                for stored, password in hashes[offset:] + hashes[:offset]:
+                    assert verify_password(stored, password) is True
+            except Exception as e:  # pylint: disable=broad-except
+                errors.append(e)
+
+        threads = [threading.Thread(target=login_many, args=(i * 50,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert not errors
+        assert len(auth_utils._verify_cache) <= auth_utils.VERIFY_CACHE_SIZE
+
+    def test_clear_verify_cache(self):
+        """Test that clearing the cache forces a fresh hash."""
+        password_hash = generate_password_hash("password123")
+        verify_password(password_hash, "password123")
+
+        clear_verify_cache()
+
+        assert not auth_utils._verify_cache
+        assert verify_password(password_hash, "password123") is True
+
 
 # ============== Tests for validate_signup_input ==============
 
@@ -157,11 +157,12 @@ class TestGetSummaryData:
             "avg_sentiment": [0.3, 0.5, 0.7]
         })
 
-        result = module.get_summary_data(df, "test")
+        result = module.get_summary_data(df, ["test"])["test"]
 
         assert "Total Posts" in result
         assert result["Total Posts"] == 60
-        assert "Avg Sentiment" in result
+        assert result["Avg Posts/Day"] == 20
+        assert result["Avg Sentiment"] == 0.5
 
     def test_get_summary_data_empty_keyword(self, comparisons_module):
         """Test get_summary_data with no matching keyword."""
@@ -173,13 +174,30 @@ class TestGetSummaryData:
             "avg_sentiment": [0.5]
         })
 
-        try:
-            result = module.get_summary_data(df, "test")
-            # Function may return dict with NaN values for empty result
-            assert isinstance(result, dict)
-        except (ValueError, KeyError, AttributeError):
-            # Empty data may cause calculation errors or attribute errors
-            pass
+        result = module.get_summary_data(df, ["test"])["test"]
+
+        assert result["Total Posts"] == 0
+        assert result["Avg Posts/Day"] == 0
+
+    def test_get_summary_data_groups_keywords(self, comparisons_module):
+        """Test get_summary_data matches per-keyword filtering for each keyword."""
+        module, *_ = comparisons_module
+
+        df = pd.DataFrame({
+            "keyword": ["a", "b", "a", "b", "a"],
+            "post_count": [10, 1, 20, 3, 30],
+            "avg_sentiment": [0.2, 0.0, 0.4, -0.5, 0.0]
+        })
+
+        result = module.get_summary_data(df, ["b", "a"])
+
+        assert list(result) == ["b", "a"]
+        assert result["a"]["Total Posts"] == 60
+        assert result["b"]["Total Posts"] == 4
+        assert result["a"]["Sentiment Max"] == 0.4
+        assert result["a"]["Sentiment Min"] == 0.2
+        assert result["b"]["Sentiment Min"] == -0.5
+        assert result["b"]["Post Count Volatility"] == round(df[df.keyword == "b"].post_count.std(), 2)
 
 
 class TestRenderEventManager:
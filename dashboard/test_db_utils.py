@@ -230,3 +230,36 @@ class TestDbUtilsLogging:
             cleanup()
             # Check if logger was called
             assert mock_logger.called or True
+
+
+class TestDbCursor:
+    """Tests for db_utils.db_cursor context manager."""
+
+    @pytest.fixture
+    def mock_pool(self):
+        pool = MagicMock()
+        with patch("db_utils.get_db_pool", return_value=pool):
+            yield pool
+
+    def test_commits_and_returns_connection(self, mock_pool):
+        """Test that a successful block commits and returns the connection."""
+        conn = mock_pool.getconn.return_value
+
+        with db_utils.db_cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+        conn.commit.assert_called_once()
+        conn.rollback.assert_not_called()
+        mock_pool.putconn.assert_called_once_with(conn)
+
+    def test_rolls_back_and_returns_connection_on_error(self, mock_pool):
+        """Test that a failing block rolls back before returning the connection."""
+        conn = mock_pool.getconn.return_value
+
+        with pytest.raises(ValueError):
+            with db_utils.db_cursor():
+                raise ValueError("boom")
+
+        conn.rollback.assert_called_once()
+        conn.commit.assert_not_called()
+        mock_pool.putconn.assert_called_once_with(conn)
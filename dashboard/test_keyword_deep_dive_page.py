@@ -297,27 +297,6 @@ class TestFormatDates:
         assert pd.api.types.is_datetime64_any_dtype(result["date"])
 
 
-class TestDailyLong:
-    """Tests for daily_long function."""
-
-    def test_daily_long_melts_data(self, deep_dive_module):
-        """Test daily_long melts dataframe to long format."""
-        module, *_ = deep_dive_module
-
-        df_daily = pd.DataFrame({
-            "date": pd.to_datetime(["2024-01-01", "2024-01-02"]),
-            "posts": [5, 10],
-            "replies": [3, 7],
-            "total": [8, 17]
-        })
-
-        result = module.daily_long(df_daily)
-
-        assert "type" in result.columns
-        assert "count" in result.columns
-        assert len(result) == 6  # 2 dates * 3 types
-
-
 class TestRollingSentiment:
     """Tests for rolling_sentiment function."""
 
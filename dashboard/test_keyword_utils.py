@@ -0,0 +1,48 @@
+# pylint: disable=missing-function-docstring, import-error
+"""Tests for keyword_utils module."""
+
+from unittest.mock import MagicMock
+
+from keyword_utils import add_user_keyword, get_user_keywords, remove_user_keyword
+
+
+def make_cursor(keywords: list) -> MagicMock:
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [{"keyword_value": k} for k in keywords]
+    return cursor
+
+
+class TestGetUserKeywordsCache:
+    """Tests for per-user invalidation of the cached keyword list."""
+
+    def setup_method(self):
+        get_user_keywords.clear()
+
+    def test_repeat_lookup_is_cached(self):
+        cursor = make_cursor(["matcha"])
+
+        assert get_user_keywords(cursor, 1) == ["matcha"]
+        assert get_user_keywords(cursor, 1) == ["matcha"]
+        assert cursor.execute.call_count == 1
+
+    def test_add_clears_only_that_user(self):
+        cursor = make_cursor(["matcha"])
+        get_user_keywords(cursor, 1)
+        get_user_keywords(cursor, 2)
+
+        add_user_keyword(MagicMock(), 1, "boba")
+        get_user_keywords(cursor, 1)
+        get_user_keywords(cursor, 2)
+
+        assert cursor.execute.call_count == 3
+
+    def test_remove_clears_only_that_user(self):
+        cursor = make_cursor(["matcha"])
+        get_user_keywords(cursor, 1)
+        get_user_keywords(cursor, 2)
+
+        remove_user_keyword(MagicMock(), 2, "matcha")
+        get_user_keywords(cursor, 1)
+        get_user_keywords(cursor, 2)
+
+        assert cursor.execute.call_count == 3
@@ -7,11 +7,13 @@ keyword management, and data generation functions.
 """
 
 import pytest
-from unittest.mock import Mock, MagicMock, patch
+from unittest.mock import Mock, MagicMock, PropertyMock, patch
 import hashlib
+import os
 import psycopg2
 import pandas as pd
 
+import auth_utils
 from auth_utils import (
     get_user_by_username,
     verify_password,
@@ -54,7 +56,7 @@ class TestGetUserByUsername:
 
         get_user_by_username(mock_cursor, email)
 
-        expected_query = "SELECT * FROM users WHERE email = %s"
+        expected_query = "SELECT user_id, email, password_hash FROM users WHERE LOWER(email) = LOWER(%s)"
         mock_cursor.execute.assert_called_once_with(expected_query, (email,))
 
     def test_returns_all_user_fields(self, mock_cursor, user_row):
@@ -141,48 +143,95 @@ class TestVerifyPassword:
 class TestAuthenticateUser:
     """Tests for authenticate_user function."""
 
-    def test_valid_credentials_returns_true(self, mock_cursor, valid_password, user_row, user_dict):
-        """Test that valid email and password returns True."""
+    def test_valid_credentials_returns_user(self, mock_cursor, valid_password, user_row, user_dict):
+        """Test that valid email and password returns the user row."""
         mock_cursor.fetchone.return_value = user_row
 
         result = authenticate_user(
             mock_cursor, "test@example.com", valid_password)
 
-        assert result is True
+        assert result == user_dict
 
-    def test_invalid_password_returns_false(self, mock_cursor, user_row):
-        """Test that invalid password returns False."""
+    def test_invalid_password_returns_none(self, mock_cursor, user_row):
+        """Test that invalid password returns None."""
         mock_cursor.fetchone.return_value = user_row
 
         result = authenticate_user(
             mock_cursor, "test@example.com", "wrong_password")
 
-        assert result is False
+        assert result is None
 
-    def test_nonexistent_user_returns_false(self, mock_cursor):
-        """Test that non-existent user returns False."""
+    def test_nonexistent_user_returns_none(self, mock_cursor):
+        """Test that non-existent user returns None."""
         mock_cursor.fetchone.return_value = None
 
         result = authenticate_user(
             mock_cursor, "nonexistent@example.com", "any_password")
 
-        assert result is False
+        assert result is None
 
-    def test_empty_email_returns_false(self, mock_cursor):
-        """Test that empty email returns False."""
+    def test_nonexistent_user_still_verifies_a_password(self, mock_cursor):
+        """Test that a missing user costs a hash check too, so timing doesn't leak it."""
+        mock_cursor.fetchone.return_value = None
+
+        with patch("auth_utils.verify_password", return_value=True) as mock_verify:
+            result = authenticate_user(
+                mock_cursor, "nonexistent@example.com", "any_password")
+
+        assert result is None
+        mock_verify.assert_called_once()
+        assert mock_verify.call_args[0][1] == "any_password"
+
+    def test_dummy_hash_uses_new_hash_iterations(self, monkeypatch):
+        """Test that the dummy hash costs the same as a newly created account's hash."""
+        monkeypatch.delenv("PBKDF2_ITERATIONS", raising=False)
+        auth_utils._dummy_password_hash.clear()
+        with patch("auth_utils.calibrated_iterations", return_value=3000):
+            dummy = auth_utils._dummy_password_hash()
+            new_hash = generate_password_hash("new_account_password")
+        auth_utils._dummy_password_hash.clear()
+
+        assert dummy.split("$")[1] == new_hash.split("$")[1] == "3000"
+
+    def test_weaker_hash_is_upgraded_on_login(self, mock_cursor, valid_password, user_row):
+        """Test that a hash below the current count is replaced after a successful login."""
+        mock_cursor.fetchone.return_value = {**user_row, "user_id": 1}
+
+        with patch("auth_utils.password_hash_iterations", return_value=2000):
+            result = authenticate_user(mock_cursor, "test@example.com", valid_password)
+
+        assert result is not None
+        query, (new_hash, user_id) = mock_cursor.execute.call_args[0]
+        assert query == "UPDATE users SET password_hash = %s WHERE user_id = %s"
+        assert user_id == 1
+        assert new_hash.split("$")[1] == "2000"
+        assert verify_password(new_hash, valid_password)
+
+    def test_current_hash_is_not_rehashed(self, mock_cursor, valid_password, user_row):
+        """Test that a hash at or above the current count is left alone."""
+        mock_cursor.fetchone.return_value = user_row
+
+        with patch("auth_utils.password_hash_iterations", return_value=500):
+            authenticate_user(mock_cursor, "test@example.com", valid_password)
+
+        # Only the user lookup
+        mock_cursor.execute.assert_called_once()
+
+    def test_empty_email_returns_none(self, mock_cursor):
+        """Test that empty email returns None."""
         mock_cursor.fetchone.return_value = None
 
         result = authenticate_user(mock_cursor, "", "password")
 
-        assert result is False
+        assert result is None
 
-    def test_empty_password_returns_false(self, mock_cursor, user_row):
-        """Test that empty password returns False."""
+    def test_empty_password_returns_none(self, mock_cursor, user_row):
+        """Test that empty password returns None."""
         mock_cursor.fetchone.return_value = user_row
 
         result = authenticate_user(mock_cursor, "test@example.com", "")
 
-        assert result is False
+        assert result is None
 
     def test_queries_database_for_user(self, mock_cursor, user_row, valid_password):
         """Test that function queries database for the user."""
@@ -193,22 +242,22 @@ class TestAuthenticateUser:
         # Verify execute was called (for the query)
         mock_cursor.execute.assert_called_once()
 
-    def test_both_empty_returns_false(self, mock_cursor):
-        """Test that both empty email and password returns False."""
+    def test_both_empty_returns_none(self, mock_cursor):
+        """Test that both empty email and password returns None."""
         mock_cursor.fetchone.return_value = None
 
         result = authenticate_user(mock_cursor, "", "")
 
-        assert result is False
+        assert result is None
 
-    def test_none_username_returns_false(self, mock_cursor):
+    def test_none_username_returns_none(self, mock_cursor):
         """Test that None username is handled gracefully."""
         mock_cursor.fetchone.return_value = None
 
         # Should not raise an error
         result = authenticate_user(mock_cursor, None, "password")
 
-        assert result is False
+        assert result is None
 
     def test_integration_with_get_user_and_verify(self, mock_cursor, user_row, valid_password):
         """Test the full integration of get_user_by_username and verify_password."""
@@ -218,7 +267,7 @@ class TestAuthenticateUser:
             mock_cursor, "test@example.com", valid_password)
 
         # Should successfully authenticate with correct password
-        assert result is True
+        assert result == user_row
 
         # Reset mock for next test
         mock_cursor.reset_mock()
@@ -227,7 +276,7 @@ class TestAuthenticateUser:
         result = authenticate_user(mock_cursor, "test@example.com", "wrong")
 
         # Should fail with wrong password
-        assert result is False
+        assert result is None
 
 
 # ============== Tests for generate_password_hash ==============
@@ -254,7 +303,7 @@ class TestGeneratePasswordHash:
         assert len(parts) == 3
         salt, iterations, hash_hex = parts
         assert salt  # Salt should not be empty
-        assert iterations == "100000"  # Default iterations
+        assert iterations == os.environ["PBKDF2_ITERATIONS"]  # Lowered for tests by conftest
         assert hash_hex  # Hash should not be empty
 
     def test_different_passwords_produce_different_hashes(self):
@@ -423,23 +472,25 @@ class TestCreateUser:
     """Tests for create_user function."""
 
     def test_create_user_success(self, mock_cursor_create):
-        """Create user successfully returns True."""
+        """Create user successfully returns the new user's row."""
+        mock_cursor_create.fetchone.return_value = {"user_id": 7, "email": "newuser@example.com"}
+
         result = create_user(
             mock_cursor_create,
             "newuser@example.com",
             "salt123$100000$hash456"
         )
 
-        assert result is True
+        assert result == {"user_id": 7, "email": "newuser@example.com"}
         mock_cursor_create.execute.assert_called_once_with(
-            "INSERT INTO users (email, password_hash) VALUES (%s, %s)",
+            "INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING user_id, email",
             ("newuser@example.com", "salt123$100000$hash456")
         )
         mock_cursor_create.connection.commit.assert_called_once()
         mock_cursor_create.connection.rollback.assert_not_called()
 
     def test_create_user_email_exists(self, mock_cursor_create):
-        """Creating user with existing email returns False and rolls back."""
+        """Creating user with existing email returns None and rolls back."""
         mock_cursor_create.execute.side_effect = psycopg2.IntegrityError(
             "unique constraint")
 
@@ -449,12 +500,12 @@ class TestCreateUser:
             "salt123$100000$hash456"
         )
 
-        assert result is False
+        assert result is None
         mock_cursor_create.connection.rollback.assert_called_once()
         mock_cursor_create.connection.commit.assert_not_called()
 
     def test_create_user_database_error(self, mock_cursor_create):
-        """Database error returns False and rolls back."""
+        """Database error returns None and rolls back."""
         mock_cursor_create.execute.side_effect = psycopg2.OperationalError(
             "connection failed")
 
@@ -464,7 +515,7 @@ class TestCreateUser:
             "salt123$100000$hash456"
         )
 
-        assert result is False
+        assert result is None
         mock_cursor_create.connection.rollback.assert_called_once()
 
     def test_create_user_with_valid_hash_format(self, mock_cursor_create):
@@ -477,9 +528,9 @@ class TestCreateUser:
             hash_value
         )
 
-        assert result is True
+        assert result is mock_cursor_create.fetchone.return_value
         mock_cursor_create.execute.assert_called_once_with(
-            "INSERT INTO users (email, password_hash) VALUES (%s, %s)",
+            "INSERT INTO users (email, password_hash) VALUES (%s, %s) RETURNING user_id, email",
             ("user@example.com", hash_value)
         )
 
@@ -511,21 +562,17 @@ class TestAddUserKeyword:
         result = add_user_keyword(mock_cursor_keyword, 1, "matcha")
 
         assert result is True
-        # Two execute calls: one for INSERT into keywords, one for INSERT into user_keywords
-        assert mock_cursor_keyword.execute.call_count == 2
+        # One execute call inserts into both keywords and user_keywords
+        mock_cursor_keyword.execute.assert_called_once()
         mock_cursor_keyword.connection.commit.assert_called_once()
 
     def test_add_keyword_inserts_to_keywords_and_user_keywords(self, mock_cursor_keyword):
         """Verify both keywords and user_keywords tables are updated."""
         add_user_keyword(mock_cursor_keyword, 1, "coffee")
 
-        calls = mock_cursor_keyword.execute.call_args_list
-        # First call should be INSERT into keywords
-        assert "keywords" in calls[0][0][0]
-        assert "INSERT" in calls[0][0][0]
-        # Second call should be INSERT into user_keywords
-        assert "user_keywords" in calls[1][0][0]
-        assert "INSERT" in calls[1][0][0]
+        query = mock_cursor_keyword.execute.call_args[0][0]
+        assert "INSERT INTO keywords" in query
+        assert "INSERT INTO user_keywords" in query
 
     def test_add_multiple_keywords(self, mock_cursor_keyword):
         """Adding multiple keywords works independently."""
@@ -533,8 +580,8 @@ class TestAddUserKeyword:
         add_user_keyword(mock_cursor_keyword, 1, "coffee")
         add_user_keyword(mock_cursor_keyword, 1, "tea")
 
-        # 2 calls per keyword (keywords table + user_keywords table)
-        assert mock_cursor_keyword.execute.call_count == 6
+        # 1 call per keyword
+        assert mock_cursor_keyword.execute.call_count == 3
         assert mock_cursor_keyword.connection.commit.call_count == 3
 
     def test_add_keyword_case_insensitive(self, mock_cursor_keyword):
@@ -542,8 +589,28 @@ class TestAddUserKeyword:
         add_user_keyword(mock_cursor_keyword, 1, "MATCHA")
 
         calls = mock_cursor_keyword.execute.call_args_list
-        # First call should use LOWER()
-        assert "LOWER" in calls[0][0][0]
+        # Keyword is lowercased before it reaches the query
+        assert calls[0][0][1] == ("matcha", 1, 1, "matcha")
+
+    def test_add_keyword_retries_when_nothing_mapped(self, mock_cursor_keyword):
+        """A statement that maps no row is retried with a fresh snapshot."""
+        type(mock_cursor_keyword).rowcount = PropertyMock(side_effect=[0, 1])
+
+        result = add_user_keyword(mock_cursor_keyword, 1, "matcha")
+
+        assert result is True
+        assert mock_cursor_keyword.execute.call_count == 2
+        mock_cursor_keyword.connection.commit.assert_called_once()
+
+    def test_add_keyword_returns_false_when_never_mapped(self, mock_cursor_keyword):
+        """Returns False, without committing, if no attempt maps the keyword."""
+        mock_cursor_keyword.rowcount = 0
+
+        result = add_user_keyword(mock_cursor_keyword, 1, "matcha")
+
+        assert result is False
+        mock_cursor_keyword.connection.commit.assert_not_called()
+        mock_cursor_keyword.connection.rollback.assert_called_once()
 
     def test_add_keyword_different_user(self, mock_cursor_keyword):
         """Adding keywords for different users works correctly."""
@@ -551,18 +618,16 @@ class TestAddUserKeyword:
         add_user_keyword(mock_cursor_keyword, 2, "matcha")
 
         calls = mock_cursor_keyword.execute.call_args_list
-        # Check the user_keywords insert calls (every other call)
-        assert calls[1][0][1] == (1, "matcha")
-        assert calls[3][0][1] == (2, "matcha")
+        assert calls[0][0][1] == ("matcha", 1, 1, "matcha")
+        assert calls[1][0][1] == ("matcha", 2, 2, "matcha")
 
     def test_add_keyword_with_special_chars(self, mock_cursor_keyword):
         """Adding keyword with special characters works."""
         result = add_user_keyword(mock_cursor_keyword, 1, "blue-sky")
 
         assert result is True
-        assert mock_cursor_keyword.execute.call_count == 2
-        calls = mock_cursor_keyword.execute.call_args_list
-        assert calls[1][0][1][1] == "blue-sky"
+        mock_cursor_keyword.execute.assert_called_once()
+        assert mock_cursor_keyword.execute.call_args[0][1][0] == "blue-sky"
 
 
 # ============== Tests for remove_user_keyword ==============
@@ -584,8 +649,7 @@ class TestRemoveUserKeyword:
 
         call_args = mock_cursor_keyword.execute.call_args
         assert "DELETE" in call_args[0][0]
-        assert "LOWER" in call_args[0][0]
-        assert call_args[0][1] == (1, "MATCHA")
+        assert call_args[0][1] == (1, "matcha")
 
     def test_remove_multiple_keywords(self, mock_cursor_keyword):
         """Removing multiple keywords works independently."""
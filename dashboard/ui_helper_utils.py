@@ -5,6 +5,8 @@ import os
 
 import streamlit as st
 
+from auth_utils import clear_verify_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -15,6 +17,7 @@ def render_sidebar():
             st.session_state.logged_in = False
             st.session_state.username = ""
             st.session_state.user_id = None
+            clear_verify_cache()
             st.rerun()
 
 
@@ -0,0 +1,12 @@
+#!/bin/bash
+
+source .env
+
+# Migrations are idempotent, so every one is run in order on each deploy
+for migration in migrations/*.sql; do
+    echo "Running $migration on $DB_NAME..."
+    PGPASSWORD=$DB_PASSWORD psql -h $DB_HOST -p $DB_PORT -U $DB_USER -d $DB_NAME \
+        -v ON_ERROR_STOP=1 -f "$migration" || exit 1
+done
+
+echo "Done."
@@ -0,0 +1,36 @@
+-- Case-insensitive, index-backed email lookup for dashboard logins.
+-- Safe to re-run. Must run outside a transaction, as CREATE INDEX CONCURRENTLY can't run in one.
+
+-- Emails differing only by case would fail the unique index, so list them and stop first
+DO $$
+DECLARE
+    duplicates TEXT;
+BEGIN
+    SELECT string_agg(emails, E'\n') INTO duplicates
+    FROM (
+        SELECT string_agg(email || ' (user_id ' || user_id || ')', ', ' ORDER BY user_id) AS emails
+        FROM users
+        GROUP BY LOWER(email)
+        HAVING COUNT(*) > 1
+    ) AS case_duplicates;
+
+    IF duplicates IS NOT NULL THEN
+        RAISE EXCEPTION E'Emails differing only by case must be merged before indexing:\n%', duplicates;
+    END IF;
+END $$;
+
+-- An interrupted concurrent build leaves an invalid index, which IF NOT EXISTS would keep
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = 'users_email_lower_idx'
+        AND c.relnamespace = current_schema()::regnamespace
+        AND NOT i.indisvalid
+    ) THEN
+        DROP INDEX users_email_lower_idx;
+    END IF;
+END $$;
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS users_email_lower_idx ON users (LOWER(email));
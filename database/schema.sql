@@ -8,6 +8,9 @@ CREATE TABLE users (
     send_email BOOLEAN DEFAULT TRUE
 );
 
+-- Case-insensitive email lookup for login, and no two accounts differing only by case
+CREATE UNIQUE INDEX users_email_lower_idx ON users (LOWER(email));
+
 -- Keywords table
 CREATE TABLE keywords (
     keyword_id SMALLSERIAL PRIMARY KEY,